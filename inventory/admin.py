@@ -1,12 +1,19 @@
 from django.contrib import admin
-from .models import Product, Sale, StockMovement
+from .counters import fold
+from .models import (
+    Product, Sale, StockMovement, ArchivedSale, ArchivedStockMovement,
+    SalesPeriodSummary, StockMovementPeriodSummary, SaleIngestKey, ProductSalesStats,
+)
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'sku', 'category', 'price', 'stock', 'stock_status', 'created_at']
+    list_display = ['name', 'sku', 'category', 'price', 'available_stock', 'stock_status', 'created_at']
     list_filter = ['category', 'created_at']
     search_fields = ['name', 'sku', 'description']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'stock_shards', 'created_at', 'updated_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_available_stock()
     
     def stock_status(self, obj):
         if obj.is_out_of_stock:
@@ -15,6 +22,17 @@ class ProductAdmin(admin.ModelAdmin):
             return '⚠️ Low Stock'
         return '✅ In Stock'
     stock_status.short_description = 'Stock Status'
+    
+    def get_object(self, request, object_id, from_field=None):
+        product = super().get_object(request, object_id, from_field)
+        if product is not None and product.stock_shards:
+            if request.method == 'POST':
+                # Fold before the form is validated, so the stock entered becomes the live level
+                product.stock = fold(product.id)
+            else:
+                # Show the live level without touching the counter slots
+                product.stock = product.available_stock
+        return product
 
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
@@ -30,3 +48,40 @@ class StockMovementAdmin(admin.ModelAdmin):
     list_filter = ['movement_type', 'created_at']
     search_fields = ['product__name', 'reason']
     readonly_fields = ['id', 'created_at']
+
+@admin.register(ProductSalesStats)
+class ProductSalesStatsAdmin(admin.ModelAdmin):
+    list_display = ['product', 'units_sold', 'revenue', 'sale_count', 'last_sale_at']
+    search_fields = ['product__name', 'product__sku']
+    readonly_fields = ['product', 'units_sold', 'revenue', 'sale_count', 'last_sale_at']
+
+@admin.register(SaleIngestKey)
+class SaleIngestKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'sale_id', 'created_at']
+    search_fields = ['key', 'sale_id']
+    readonly_fields = ['key', 'sale_id', 'created_at']
+
+@admin.register(ArchivedSale)
+class ArchivedSaleAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'unit_price', 'total_price', 'sale_date', 'archived_at']
+    list_filter = ['product__category']
+    search_fields = ['product__name', 'product__sku']
+    date_hierarchy = 'sale_date'
+
+@admin.register(ArchivedStockMovement)
+class ArchivedStockMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'movement_type', 'quantity', 'reason', 'created_at', 'archived_at']
+    list_filter = ['movement_type']
+    search_fields = ['product__name', 'reason']
+
+@admin.register(SalesPeriodSummary)
+class SalesPeriodSummaryAdmin(admin.ModelAdmin):
+    list_display = ['product', 'period', 'sale_count', 'total_quantity', 'total_sales']
+    list_filter = ['period', 'product__category']
+    search_fields = ['product__name', 'product__sku']
+
+@admin.register(StockMovementPeriodSummary)
+class StockMovementPeriodSummaryAdmin(admin.ModelAdmin):
+    list_display = ['product', 'period', 'movement_type', 'movement_count', 'net_quantity']
+    list_filter = ['period', 'movement_type']
+    search_fields = ['product__name', 'product__sku']
@@ -0,0 +1,331 @@
+"""
+Columnar analytics snapshot of sales.
+
+Sales (live and archived) are exported to one flat binary file per column so
+reporting questions can be answered with NumPy over memory-mapped arrays
+instead of ORM ``GROUP BY`` queries:
+
+    sale_date.bin      int64  UTC epoch seconds, ascending
+    product.bin        int32  index into products.json
+    quantity.bin       int32  units sold
+    revenue_cents.bin  int64  total price in cents
+
+``meta.json`` records the committed row count and the append watermark, so a
+crash half-way through an append never exposes partial rows: readers only map
+``rows`` entries and the next append truncates anything past them. Sales are
+appended in ``sale_date`` order, which keeps every column sorted by date and
+lets date ranges be resolved with a binary search. A sale recorded with a
+date before the watermark (an offline till's backlog, say) cannot be appended
+in order, so ``mark_backdated`` leaves a marker and the next append does a
+full rebuild instead.
+"""
+import heapq
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ArchivedSale, Product, Sale
+
+COLUMNS = {
+    'sale_date': np.int64,
+    'product': np.int32,
+    'quantity': np.int32,
+    'revenue_cents': np.int64,
+}
+
+CHUNK_SIZE = 100_000
+
+REBUILD_MARKER = 'rebuild_needed'
+
+
+def default_path():
+    return Path(getattr(settings, 'ANALYTICS_SNAPSHOT_DIR', settings.BASE_DIR / 'analytics'))
+
+
+def _read_json(path, default):
+    if not path.exists():
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def write_columns(path, rows, arrays):
+    """Append equally sized column arrays after the first ``rows`` committed entries"""
+    for name, dtype in COLUMNS.items():
+        column_file = path / f'{name}.bin'
+        with open(column_file, 'ab') as f:
+            f.truncate(rows * np.dtype(dtype).itemsize)
+            np.asarray(arrays[name], dtype=dtype).tofile(f)
+
+
+def build_snapshot(path=None):
+    """Rebuild the snapshot from scratch, returning the number of rows written"""
+    path = Path(path or default_path())
+    path.mkdir(parents=True, exist_ok=True)
+    for name in COLUMNS:
+        (path / f'{name}.bin').unlink(missing_ok=True)
+    (path / 'meta.json').unlink(missing_ok=True)
+    (path / 'products.json').unlink(missing_ok=True)
+    # Cleared first, so a sale back-dated while the rebuild runs triggers another
+    (path / REBUILD_MARKER).unlink(missing_ok=True)
+    return _append(path)
+
+
+def append_snapshot(path=None):
+    """Append sales recorded since the last build or append, returning the number of new rows
+
+    Rebuilds from scratch instead (returning the rows written) when back-dated
+    sales have been recorded since.
+    """
+    path = Path(path or default_path())
+    if (path / REBUILD_MARKER).exists():
+        return build_snapshot(path)
+    return _append(path)
+
+
+def mark_backdated(sale_date, path=None):
+    """Flag the snapshot for a rebuild if a sale dated ``sale_date`` would miss the next append"""
+    path = Path(path or default_path())
+    if timezone.is_naive(sale_date):
+        sale_date = timezone.make_aware(sale_date)
+    meta = _read_json(path / 'meta.json', None)
+    if meta and meta['watermark'] and sale_date < datetime.fromisoformat(meta['watermark']):
+        (path / REBUILD_MARKER).touch()
+
+
+def _append(path):
+    path.mkdir(parents=True, exist_ok=True)
+    meta = _read_json(path / 'meta.json', {'rows': 0, 'watermark': None, 'watermark_ids': []})
+    products = _read_json(path / 'products.json', [])
+    product_index = {entry['id']: i for i, entry in enumerate(products)}
+
+    watermark = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+    seen_at_watermark = set(meta['watermark_ids'])
+
+    def new_sales(model):
+        sales = model.objects.order_by('sale_date')
+        if watermark is not None:
+            sales = sales.filter(sale_date__gte=watermark)
+        return sales.values_list('sale_date', 'id', 'product_id', 'quantity', 'total_price').iterator(chunk_size=CHUNK_SIZE)
+
+    rows = meta['rows']
+    appended = 0
+    chunk = {name: [] for name in COLUMNS}
+
+    for sale_date, sale_id, product_id, quantity, total_price in heapq.merge(
+        new_sales(ArchivedSale), new_sales(Sale), key=lambda row: row[0]
+    ):
+        sale_id = str(sale_id)
+        if sale_date == watermark and sale_id in seen_at_watermark:
+            continue
+        if sale_date != watermark:
+            watermark = sale_date
+            seen_at_watermark = set()
+        seen_at_watermark.add(sale_id)
+
+        product_id = str(product_id)
+        if product_id not in product_index:
+            product_index[product_id] = len(products)
+            products.append({'id': product_id})
+
+        chunk['sale_date'].append(int(sale_date.timestamp()))
+        chunk['product'].append(product_index[product_id])
+        chunk['quantity'].append(quantity)
+        chunk['revenue_cents'].append(int(total_price * 100))
+
+        if len(chunk['sale_date']) >= CHUNK_SIZE:
+            write_columns(path, rows, chunk)
+            rows += len(chunk['sale_date'])
+            appended += len(chunk['sale_date'])
+            chunk = {name: [] for name in COLUMNS}
+
+    if chunk['sale_date']:
+        write_columns(path, rows, chunk)
+        rows += len(chunk['sale_date'])
+        appended += len(chunk['sale_date'])
+
+    # Refresh product labels for every product, picking up renames as well as new entries
+    details = {
+        str(product_id): {'id': str(product_id), 'name': name, 'sku': sku, 'category': category}
+        for product_id, name, sku, category in Product.objects.values_list('id', 'name', 'sku', 'category')
+    }
+    products = [details.get(entry['id'], {'name': '', 'sku': '', 'category': '', **entry}) for entry in products]
+
+    write_json(path / 'products.json', products)
+    write_json(path / 'meta.json', {
+        'rows': rows,
+        'watermark': watermark.isoformat() if watermark else None,
+        'watermark_ids': sorted(seen_at_watermark),
+    })
+    return appended
+
+
+class SalesSnapshot:
+    """Read-only, memory-mapped view of a sales snapshot"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or default_path())
+        meta = _read_json(self.path / 'meta.json', None)
+        if meta is None:
+            raise FileNotFoundError(f'No analytics snapshot found in {self.path}')
+        self.rows = meta['rows']
+        self.products = _read_json(self.path / 'products.json', [])
+        self.columns = {}
+        for name, dtype in COLUMNS.items():
+            if self.rows:
+                self.columns[name] = np.memmap(self.path / f'{name}.bin', dtype=dtype, mode='r', shape=(self.rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=dtype)
+
+        categories = sorted({entry['category'] for entry in self.products})
+        category_codes = {category: code for code, category in enumerate(categories)}
+        self.categories = categories
+        self.product_category = np.array(
+            [category_codes[entry['category']] for entry in self.products], dtype=np.int32
+        )
+        self._rollup = None
+        self.stamp = None
+
+    def _range(self, start=None, end=None):
+        """Row bounds ``(lo, hi)`` of sales with ``start <= sale_date < end``"""
+        dates = self.columns['sale_date']
+        lo = int(np.searchsorted(dates, int(start.timestamp()), 'left')) if start else 0
+        hi = int(np.searchsorted(dates, int(end.timestamp()), 'left')) if end else self.rows
+        return lo, max(lo, hi)
+
+    def _month_bounds(self, lo, hi):
+        """Local calendar months covering rows ``lo:hi`` and the first row of each"""
+        dates = self.columns['sale_date']
+        # Shift to local time using the current UTC offset of TIME_ZONE
+        offset = int(timezone.localtime().utcoffset().total_seconds())
+        first = np.datetime64(int(dates[lo]) + offset, 's').astype('datetime64[M]')
+        last = np.datetime64(int(dates[hi - 1]) + offset, 's').astype('datetime64[M]')
+        months = np.arange(first, last + 1)
+        month_starts = months.astype('datetime64[s]').astype(np.int64) - offset
+        bounds = np.searchsorted(dates[lo:hi], month_starts, 'left') + lo
+        return months, bounds
+
+    def _scan(self, lo, hi):
+        products = self.columns['product'][lo:hi]
+        size = len(self.products)
+        revenue = np.bincount(products, weights=self.columns['revenue_cents'][lo:hi], minlength=size)
+        quantity = np.bincount(products, weights=self.columns['quantity'][lo:hi], minlength=size)
+        return revenue, quantity
+
+    def _monthly_rollup(self):
+        """Per-month revenue and units of the products that sold that month, built once on first use
+
+        Months are stored back to back (month ``i`` holds entries
+        ``offsets[i]:offsets[i + 1]``), so the rollup grows with the number of
+        product-months with sales rather than months x catalogue size.
+        """
+        if self._rollup is None:
+            months, bounds = self._month_bounds(0, self.rows)
+            ends = np.append(bounds[1:], self.rows)
+            products, revenue, quantity = [], [], []
+            for lo, hi in zip(bounds, ends):
+                sold, inverse = np.unique(self.columns['product'][lo:hi], return_inverse=True)
+                products.append(sold)
+                revenue.append(np.bincount(inverse, weights=self.columns['revenue_cents'][lo:hi], minlength=len(sold)))
+                quantity.append(np.bincount(inverse, weights=self.columns['quantity'][lo:hi], minlength=len(sold)))
+            offsets = np.cumsum([0] + [len(sold) for sold in products])
+            self._rollup = (
+                bounds, ends, offsets, np.concatenate(products), np.concatenate(revenue), np.concatenate(quantity)
+            )
+        return self._rollup
+
+    def _per_product(self, start=None, end=None):
+        """Revenue (cents) and units per product index, summed from whole-month rollups plus the partial edges"""
+        lo, hi = self._range(start, end)
+        if lo == hi:
+            return np.zeros(len(self.products)), np.zeros(len(self.products))
+        bounds, ends, offsets, rollup_products, rollup_revenue, rollup_quantity = self._monthly_rollup()
+        full = np.flatnonzero((bounds >= lo) & (ends <= hi))
+        if not len(full):
+            return self._scan(lo, hi)
+        first, last = full[0], full[-1]
+        entries = slice(offsets[first], offsets[last + 1])
+        size = len(self.products)
+        revenue = np.bincount(rollup_products[entries], weights=rollup_revenue[entries], minlength=size)
+        quantity = np.bincount(rollup_products[entries], weights=rollup_quantity[entries], minlength=size)
+        for edge_lo, edge_hi in ((lo, bounds[first]), (ends[last], hi)):
+            if edge_lo < edge_hi:
+                edge_revenue, edge_quantity = self._scan(edge_lo, edge_hi)
+                revenue += edge_revenue
+                quantity += edge_quantity
+        return revenue, quantity
+
+    def category_totals(self, start=None, end=None):
+        """Revenue and units per category, shaped like the reports view rows"""
+        revenue, quantity = self._per_product(start, end)
+        size = len(self.categories)
+        category_revenue = np.bincount(self.product_category, weights=revenue, minlength=size)
+        category_quantity = np.bincount(self.product_category, weights=quantity, minlength=size)
+        order = np.argsort(-category_revenue, kind='stable')
+        return [
+            {
+                'product__category': self.categories[i],
+                'total_sales': Decimal(int(category_revenue[i])) / 100,
+                'total_quantity': int(category_quantity[i]),
+            }
+            for i in order if category_quantity[i]
+        ]
+
+    def top_products(self, limit=10, start=None, end=None):
+        """Best selling products by revenue, shaped like the reports view rows"""
+        revenue, quantity = self._per_product(start, end)
+        limit = min(limit, len(revenue))
+        if not limit:
+            return []
+        top = np.argpartition(-revenue, limit - 1)[:limit]
+        top = top[np.argsort(-revenue[top], kind='stable')]
+        return [
+            {
+                'product__name': self.products[i]['name'],
+                'product__sku': self.products[i]['sku'],
+                'total_sales': Decimal(int(revenue[i])) / 100,
+                'total_quantity': int(quantity[i]),
+            }
+            for i in top if quantity[i]
+        ]
+
+    def monthly_totals(self, start=None, end=None):
+        """Revenue per local calendar month as ``{'month': 'YYYY-MM', 'total': Decimal}`` rows"""
+        lo, hi = self._range(start, end)
+        if lo == hi:
+            return []
+        months, bounds = self._month_bounds(lo, hi)
+        totals = np.add.reduceat(self.columns['revenue_cents'][lo:hi], bounds - lo)
+        # reduceat repeats the next value for empty months, so blank those out
+        totals[np.append(bounds[1:], hi) == bounds] = 0
+        return [
+            {'month': str(month), 'total': Decimal(int(total)) / 100}
+            for month, total in zip(months, totals) if total
+        ]
+
+
+_snapshot = None
+
+
+def get_snapshot(path=None):
+    """Shared snapshot for the current process, reopened whenever it has been rebuilt or appended to"""
+    global _snapshot
+    path = Path(path or default_path())
+    stamp = (path / 'meta.json').stat().st_mtime_ns
+    if _snapshot is None or _snapshot.path != path or _snapshot.stamp != stamp:
+        _snapshot = SalesSnapshot(path)
+        _snapshot.stamp = stamp
+    return _snapshot
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .models import Product
+        from .search import invalidate
+
+        post_save.connect(invalidate, sender=Product, dispatch_uid='inventory_search_invalidate_save')
+        post_delete.connect(invalidate, sender=Product, dispatch_uid='inventory_search_invalidate_delete')
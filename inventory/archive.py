@@ -0,0 +1,175 @@
+"""
+Archival of historical Sale and StockMovement rows.
+
+Rows older than a cutoff are copied into the archive tables and removed from
+the live tables in small batches, each in its own transaction, so the hot
+tables stay small without holding long locks. Every archived row is also
+folded into a monthly per-product summary so reports keep seeing the full
+history without reading the archive tables.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import (
+    ArchivedSale,
+    ArchivedStockMovement,
+    Product,
+    Sale,
+    SalesPeriodSummary,
+    StockMovement,
+    StockMovementPeriodSummary,
+)
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+DEFAULT_BATCH_SIZE = 1000
+
+
+def default_cutoff():
+    """Cutoff datetime derived from the ARCHIVE_AFTER_DAYS setting"""
+    days = getattr(settings, 'ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+    return timezone.now() - timedelta(days=days)
+
+
+def period_start(value):
+    """First day of the (local) month a datetime falls in"""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def archive_sales(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Move sales dated before ``cutoff`` into the archive, returning the row count"""
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch = list(Sale.objects.filter(sale_date__lt=cutoff).order_by('sale_date')[:batch_size])
+            if not batch:
+                break
+            ArchivedSale.objects.bulk_create([
+                ArchivedSale(
+                    id=sale.id,
+                    product_id=sale.product_id,
+                    quantity=sale.quantity,
+                    unit_price=sale.unit_price,
+                    total_price=sale.total_price,
+                    sale_date=sale.sale_date,
+                )
+                for sale in batch
+            ])
+            _add_sales_summaries(batch)
+            Sale.objects.filter(id__in=[sale.id for sale in batch]).delete()
+        archived += len(batch)
+    return archived
+
+
+def archive_stock_movements(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Move stock movements created before ``cutoff`` into the archive, returning the row count"""
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch = list(StockMovement.objects.filter(created_at__lt=cutoff).order_by('created_at')[:batch_size])
+            if not batch:
+                break
+            ArchivedStockMovement.objects.bulk_create([
+                ArchivedStockMovement(
+                    id=movement.id,
+                    product_id=movement.product_id,
+                    movement_type=movement.movement_type,
+                    quantity=movement.quantity,
+                    reason=movement.reason,
+                    created_at=movement.created_at,
+                )
+                for movement in batch
+            ])
+            _add_movement_summaries(batch)
+            StockMovement.objects.filter(id__in=[movement.id for movement in batch]).delete()
+        archived += len(batch)
+    return archived
+
+
+def _add_sales_summaries(sales):
+    totals = defaultdict(lambda: [0, 0, Decimal('0')])
+    for sale in sales:
+        entry = totals[(sale.product_id, period_start(sale.sale_date))]
+        entry[0] += 1
+        entry[1] += sale.quantity
+        entry[2] += sale.total_price
+
+    for (product_id, period), (count, quantity, total) in totals.items():
+        updated = SalesPeriodSummary.objects.filter(product_id=product_id, period=period).update(
+            sale_count=F('sale_count') + count,
+            total_quantity=F('total_quantity') + quantity,
+            total_sales=F('total_sales') + total,
+        )
+        if not updated:
+            SalesPeriodSummary.objects.create(
+                product_id=product_id,
+                period=period,
+                sale_count=count,
+                total_quantity=quantity,
+                total_sales=total,
+            )
+
+
+def _add_movement_summaries(movements):
+    totals = defaultdict(lambda: [0, 0])
+    for movement in movements:
+        entry = totals[(movement.product_id, period_start(movement.created_at), movement.movement_type)]
+        entry[0] += 1
+        entry[1] += movement.quantity
+
+    for (product_id, period, movement_type), (count, quantity) in totals.items():
+        updated = StockMovementPeriodSummary.objects.filter(
+            product_id=product_id, period=period, movement_type=movement_type
+        ).update(
+            movement_count=F('movement_count') + count,
+            net_quantity=F('net_quantity') + quantity,
+        )
+        if not updated:
+            StockMovementPeriodSummary.objects.create(
+                product_id=product_id,
+                period=period,
+                movement_type=movement_type,
+                movement_count=count,
+                net_quantity=quantity,
+            )
+
+
+def merge_totals(key_fields, *result_sets):
+    """Combine ``total_sales``/``total_quantity`` rows from live and summary aggregates"""
+    merged = {}
+    for rows in result_sets:
+        for row in rows:
+            key = tuple(row[field] for field in key_fields)
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            merged[key]['total_sales'] = (merged[key]['total_sales'] or 0) + (row['total_sales'] or 0)
+            merged[key]['total_quantity'] = (merged[key]['total_quantity'] or 0) + (row['total_quantity'] or 0)
+    return sorted(merged.values(), key=lambda row: row['total_sales'] or 0, reverse=True)
+
+
+def benchmark_hot_queries(repeat=20):
+    """Average latency in ms of the queries behind sales_list, product_detail and reports"""
+    product = Product.objects.order_by('?').first()
+    queries = {
+        'sales_list page': lambda: list(Sale.objects.select_related('product').order_by('-sale_date')[:20]),
+        'sales_list totals': lambda: (
+            Sale.objects.aggregate(total=Sum('total_price'), quantity=Sum('quantity')),
+            SalesPeriodSummary.objects.aggregate(total=Sum('total_sales'), quantity=Sum('total_quantity')),
+        ),
+        'product_detail recent sales': lambda: list(product.sales.order_by('-sale_date')[:10]) if product else [],
+        'reports by category': lambda: list(Sale.objects.values('product__category').annotate(total=Sum('total_price'))),
+    }
+    results = {}
+    for name, query in queries.items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query()
+        results[name] = (time.perf_counter() - started) * 1000 / repeat
+    return results
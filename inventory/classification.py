@@ -0,0 +1,223 @@
+"""
+ABC (Pareto) classification of the catalogue.
+
+Every product is ranked by revenue over a period and classed by the
+cumulative revenue share of the products ranked above it: A up to
+ABC_CLASS_A_SHARE (80%), B up to ABC_CLASS_B_SHARE (95%), C for the rest,
+including anything that did not sell. Alongside the class each product gets
+its stock value (price x available stock) and turnover (units sold over the
+period / available stock).
+
+Price and stock for every product come from one query, revenue and units
+per product from one grouped query (plus one over the archive for dated
+periods), straight into NumPy arrays; ranking, cumulative shares and classes
+are then computed in a handful of vectorized passes. Product ids are read
+as text, which skips per-row UUID conversion, and kept as fixed-width bytes,
+so reports hold only flat arrays and pickle cheaply into the Django cache,
+where each period is kept for ABC_CACHE_TIMEOUT seconds. Names are
+looked up by id for just the rows being displayed or exported.
+"""
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import CharField, FloatField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .counters import unfolded_sales_by_product
+from .models import ArchivedSale, Product, ProductSalesStats, Sale
+
+# Reporting periods: key -> days of sales counted (None for lifetime totals)
+PERIODS = {
+    '30': 30,
+    '90': 90,
+    '365': 365,
+    'all': None,
+}
+DEFAULT_PERIOD = '90'
+
+CLASSES = ('A', 'B', 'C')
+
+# Products per name lookup when rows are displayed or exported
+LOOKUP_BATCH_SIZE = 2000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AbcReport:
+    """Products ranked by revenue with their ABC class, stock value and turnover
+
+    Every array is in rank order, best seller first.
+    """
+
+    def __init__(self, period, generated_at, ids, revenue, units, price, stock):
+        self.period = period
+        self.generated_at = generated_at
+        self.ids = ids
+        self.revenue = revenue
+        self.units = units
+        self.price = price
+        self.stock = stock
+
+        total = revenue.sum()
+        if total > 0:
+            # Share of revenue taken by the products ranked above each one
+            share_before = (np.cumsum(revenue) - revenue) / total
+        else:
+            share_before = np.ones(len(revenue))
+        self.share = revenue / total if total > 0 else np.zeros(len(revenue))
+        self.cumulative_share = share_before + self.share
+
+        rank_class = np.full(len(revenue), 2, dtype=np.int8)
+        rank_class[share_before < _setting('ABC_CLASS_B_SHARE', 0.95)] = 1
+        rank_class[share_before < _setting('ABC_CLASS_A_SHARE', 0.80)] = 0
+        rank_class[revenue <= 0] = 2
+        self.rank_class = rank_class
+
+        self.stock_value = price * stock
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.turnover = np.where(stock > 0, units / np.maximum(stock, 1), np.nan)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        # Slices only, which is all Paginator needs
+        start, stop, _ = index.indices(len(self))
+        return list(self.rows(start, stop))
+
+    def summary(self):
+        """Product count, revenue, share and stock value per class"""
+        counts = np.bincount(self.rank_class, minlength=3)
+        revenue = np.bincount(self.rank_class, weights=self.revenue, minlength=3)
+        stock_value = np.bincount(self.rank_class, weights=self.stock_value, minlength=3)
+        units = np.bincount(self.rank_class, weights=self.units, minlength=3)
+        stock = np.bincount(self.rank_class, weights=self.stock, minlength=3)
+        total = revenue.sum()
+        return [
+            {
+                'abc_class': CLASSES[i],
+                'products': int(counts[i]),
+                'revenue': float(revenue[i]),
+                'revenue_share': float(revenue[i] / total) if total > 0 else 0.0,
+                'stock_value': float(stock_value[i]),
+                'turnover': float(units[i] / stock[i]) if stock[i] > 0 else None,
+            }
+            for i in range(3)
+        ]
+
+    def rows(self, start=0, stop=None):
+        """Report rows in rank order, with product name, SKU and category"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for offset in range(start, stop, LOOKUP_BATCH_SIZE):
+            end = min(offset + LOOKUP_BATCH_SIZE, stop)
+            batch = [uuid.UUID(value.decode()) for value in self.ids[offset:end]]
+            products = Product.objects.only('id', 'name', 'sku', 'category').in_bulk(batch)
+            for i, product_id in enumerate(batch, start=offset):
+                product = products.get(product_id)
+                if product is None:
+                    continue  # Deleted since the report was built
+                turnover = self.turnover[i]
+                yield {
+                    'rank': i + 1,
+                    'product': product,
+                    'abc_class': CLASSES[self.rank_class[i]],
+                    'units_sold': int(self.units[i]),
+                    'revenue': float(self.revenue[i]),
+                    'revenue_share': float(self.share[i]),
+                    'cumulative_share': float(self.cumulative_share[i]),
+                    'stock': int(self.stock[i]),
+                    'stock_value': float(self.stock_value[i]),
+                    'turnover': None if np.isnan(turnover) else float(turnover),
+                }
+
+
+def _id_array(product_ids):
+    return np.array(product_ids, dtype='S36')
+
+
+def _id_text(field):
+    # Hex on SQLite, hyphenated on databases with a native uuid type
+    return Cast(field, CharField())
+
+
+def _as_id_text(product_id):
+    """A UUID in the form ``_id_text`` reads it from the database"""
+    return str(product_id) if connection.features.has_native_uuid_field else product_id.hex
+
+
+def _positions(ids, order, wanted):
+    """Indexes into ``ids`` (sorted by ``order``) of the ``wanted`` ids, and which were found"""
+    if not len(ids):
+        return np.zeros(0, dtype=np.int64), np.zeros(len(wanted), dtype=bool)
+    sorted_ids = ids[order]
+    slot = np.minimum(np.searchsorted(sorted_ids, wanted), len(ids) - 1)
+    found = sorted_ids[slot] == wanted
+    return order[slot[found]], found
+
+
+def _sales_querysets(days):
+    """Querysets of (product id, revenue, units) for products that sold in the period"""
+    if days is None:
+        return [
+            ProductSalesStats.objects.filter(sale_count__gt=0).values_list(
+                _id_text('product'), Cast('revenue', FloatField()), 'units_sold'
+            )
+        ]
+    since = timezone.now() - timedelta(days=days)
+    return [
+        model.objects.filter(sale_date__gte=since).values('product').annotate(
+            total=Cast(Sum('total_price'), FloatField()),
+            units=Sum('quantity'),
+        ).values_list(_id_text('product'), 'total', 'units')
+        for model in (Sale, ArchivedSale)
+    ]
+
+
+def build_report(period=DEFAULT_PERIOD):
+    """Classify every product on its sales over ``period`` (a PERIODS key)"""
+    generated_at = timezone.now()
+    products = list(Product.objects.values_list(_id_text('id'), Cast('price', FloatField()), 'stock'))
+    ids = _id_array([row[0] for row in products])
+    price = np.fromiter((row[1] for row in products), dtype=np.float64, count=len(products))
+    stock = np.fromiter((row[2] for row in products), dtype=np.int64, count=len(products))
+    del products
+    order = np.argsort(ids)
+
+    # Sales still held in sharded counter slots are not yet off Product.stock
+    unfolded = unfolded_sales_by_product()
+    if unfolded:
+        target, found = _positions(ids, order, _id_array([_as_id_text(product_id) for product_id in unfolded]))
+        consumed = np.fromiter(unfolded.values(), dtype=np.int64, count=len(unfolded))
+        stock[target] = np.maximum(0, stock[target] - consumed[found])
+
+    # Products created after the product query ran are left out
+    revenue = np.zeros(len(ids))
+    units = np.zeros(len(ids), dtype=np.int64)
+    for queryset in _sales_querysets(PERIODS[period]):
+        sold = list(queryset)
+        target, found = _positions(ids, order, _id_array([row[0] for row in sold]))
+        np.add.at(revenue, target, np.fromiter((row[1] for row in sold), dtype=np.float64, count=len(sold))[found])
+        np.add.at(units, target, np.fromiter((row[2] for row in sold), dtype=np.int64, count=len(sold))[found])
+
+    # Best sellers first; ties keep id order so reports are stable
+    rank = np.lexsort((ids, -revenue))
+    return AbcReport(
+        period, generated_at, ids[rank], revenue[rank], units[rank], price[rank], stock[rank]
+    )
+
+
+def get_report(period=DEFAULT_PERIOD, refresh=False):
+    """Cached ABC report for ``period``, rebuilt after ABC_CACHE_TIMEOUT seconds"""
+    key = f'inventory:abc:{period}'
+    report = None if refresh else cache.get(key)
+    if report is None:
+        report = build_report(period)
+        cache.set(key, report, _setting('ABC_CACHE_TIMEOUT', 300))
+    return report
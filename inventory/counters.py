@@ -0,0 +1,154 @@
+"""
+Sharded stock counters for hot products.
+
+A product with ``stock_shards`` set sells from that many StockCounterShard
+rows instead of rewriting its own row on every sale, so concurrent tills
+contend on different rows. At each fold the product's stock is spread across
+the slots; a sale takes its quantity from a random slot with a conditional
+``UPDATE ... WHERE remaining >= quantity``, which can never drive a slot
+below zero. Only when no single slot can cover a sale are the slots locked
+and drained together. The same UPDATE adds the sale's revenue, count and date
+to the slot, so sales statistics never touch a shared row either; folding
+adds them to ProductSalesStats.
+
+``Product.stock`` keeps the stock as of the last fold; the live figure is
+``stock - (allocated - remaining)`` summed over the slots (see
+``Product.available_stock``). Folding moves the consumed quantity into
+``Product.stock`` and redistributes what is left. ``Product.save`` folds a
+sharded product, so restocks and corrections reach the slots as soon as they
+are saved; stock set below what the slots have already sold is rejected.
+"""
+import random
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Product, StockCounterShard
+from .stats import record_sales
+
+
+class InsufficientStock(ValueError):
+    pass
+
+
+def unfolded_sales(product):
+    """Units sold from the product's slots since the last fold"""
+    return product.counter_shards.aggregate(
+        total=Sum(F('allocated') - F('remaining'))
+    )['total'] or 0
+
+
+def unfolded_sales_by_product():
+    """Units sold from slots since the last fold, keyed by product id"""
+    return dict(
+        StockCounterShard.objects.values('product').annotate(
+            consumed=Sum(F('allocated') - F('remaining'))
+        ).values_list('product', 'consumed')
+    )
+
+
+def unfolded_stats(product):
+    """Units, revenue, sale count and last sale time recorded in the slots since the last fold"""
+    totals = product.counter_shards.aggregate(
+        units=Sum(F('allocated') - F('remaining')),
+        revenue=Sum('revenue'),
+        count=Sum('sale_count'),
+        last=Max('last_sale_at'),
+    )
+    return totals['units'] or 0, totals['revenue'] or Decimal('0'), totals['count'] or 0, totals['last']
+
+
+def _sale_update(quantity, revenue, sold_at):
+    return {
+        'remaining': F('remaining') - quantity,
+        'revenue': F('revenue') + revenue,
+        'sale_count': F('sale_count') + 1,
+        'last_sale_at': Greatest(Coalesce('last_sale_at', Value(sold_at)), Value(sold_at)),
+    }
+
+
+def take_stock(product, quantity, revenue, sold_at):
+    """Remove ``quantity`` units from a sharded product's slots, recording the sale there"""
+    revenue = Decimal(str(revenue)).quantize(Decimal('0.01'))
+    slots = list(range(product.stock_shards))
+    random.shuffle(slots)
+    for slot in slots:
+        if StockCounterShard.objects.filter(
+            product_id=product.id, slot=slot, remaining__gte=quantity
+        ).update(**_sale_update(quantity, revenue, sold_at)):
+            return
+
+    # No single slot can cover the sale, so drain several under lock
+    with transaction.atomic():
+        shards = list(StockCounterShard.objects.select_for_update().filter(product_id=product.id).order_by('slot'))
+        available = sum(shard.remaining for shard in shards)
+        if available < quantity:
+            raise InsufficientStock(f"Insufficient stock. Only {available} units available.")
+        needed = quantity
+        for shard in shards:
+            taken = min(shard.remaining, needed)
+            if taken:
+                shard.remaining -= taken
+                shard.save(update_fields=['remaining'])
+                needed -= taken
+            if not needed:
+                break
+        # The statistics go to one slot; fold() only needs their sum
+        StockCounterShard.objects.filter(pk=shards[0].pk).update(**_sale_update(0, revenue, sold_at))
+
+
+@transaction.atomic
+def fold(product_id, shards=None):
+    """Fold slot sales into ``Product.stock`` and respread it over ``shards`` slots
+
+    ``shards`` defaults to the product's current setting; 0 turns sharding off.
+    Returns the folded stock level.
+    """
+    product = Product.objects.select_for_update().get(id=product_id)
+    slots = list(StockCounterShard.objects.select_for_update().filter(product=product).order_by('slot'))
+    consumed = sum(slot.allocated - slot.remaining for slot in slots)
+
+    if consumed > product.stock:
+        raise InsufficientStock(
+            f"{product} has sold {consumed} units from its counter slots but only {product.stock} are in stock."
+        )
+    product.stock -= consumed
+    sale_count = sum(slot.sale_count for slot in slots)
+    if sale_count:
+        record_sales(
+            product.id,
+            consumed,
+            sum(slot.revenue for slot in slots),
+            sale_count,
+            max(slot.last_sale_at for slot in slots if slot.last_sale_at),
+        )
+    if shards is not None:
+        product.stock_shards = shards
+    # Not product.save(), which folds sharded products itself
+    Product.objects.filter(id=product.id).update(
+        stock=product.stock, stock_shards=product.stock_shards, updated_at=timezone.now()
+    )
+
+    StockCounterShard.objects.filter(product=product, slot__gte=product.stock_shards).delete()
+    if product.stock_shards:
+        share, extra = divmod(product.stock, product.stock_shards)
+        existing = {slot.slot: slot for slot in slots}
+        for slot in range(product.stock_shards):
+            amount = share + (1 if slot < extra else 0)
+            shard = existing.get(slot) or StockCounterShard(product=product, slot=slot)
+            shard.allocated = shard.remaining = amount
+            shard.revenue, shard.sale_count, shard.last_sale_at = Decimal('0'), 0, None
+            shard.save()
+    return product.stock
+
+
+def fold_all():
+    """Fold every sharded product, returning how many were folded"""
+    product_ids = list(Product.objects.filter(stock_shards__gt=0).values_list('id', flat=True))
+    for product_id in product_ids:
+        fold(product_id)
+    return len(product_ids)
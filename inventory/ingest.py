@@ -0,0 +1,190 @@
+"""
+Idempotent, batched sale submission for POS clients.
+
+Tills send batches of sales, each carrying a client-generated idempotency
+key. A batch is applied in one transaction: keys already on record are
+reported as duplicates, everything new is bulk inserted together with its
+stock movement and key, and stock is decremented once per accepted line.
+Replaying a batch after a lost response is therefore always safe.
+
+Tills authenticate with a bearer token listed in SALE_INGEST_TOKENS; with no
+tokens configured the endpoint accepts nothing.
+"""
+import hmac
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .analytics import mark_backdated
+from .counters import InsufficientStock, take_stock
+from .models import Product, Sale, SaleIngestKey, StockMovement
+from .stats import record_sales
+
+DEFAULT_MAX_BATCH = 5000
+
+
+class BatchError(ValueError):
+    pass
+
+
+def max_batch_size():
+    return getattr(settings, 'SALE_INGEST_MAX_BATCH', DEFAULT_MAX_BATCH)
+
+
+def is_authorized(authorization):
+    """Whether an ``Authorization`` header carries one of the configured till tokens"""
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    return any(
+        hmac.compare_digest(token.encode(), allowed.encode())
+        for allowed in getattr(settings, 'SALE_INGEST_TOKENS', [])
+    )
+
+
+def parse_line(line):
+    """Validate one submitted sale, returning ``(key, product_ref, quantity, sale_date)``"""
+    if not isinstance(line, dict):
+        raise ValueError('Each sale must be an object')
+    key = line.get('key')
+    if not isinstance(key, str) or not key or len(key) > 100:
+        raise ValueError('key must be a non-empty string of at most 100 characters')
+    product_ref = line.get('product_id') or line.get('sku')
+    if not isinstance(product_ref, str) or not product_ref:
+        raise ValueError('product_id or sku is required')
+    quantity = line.get('quantity')
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+        raise ValueError('quantity must be a positive integer')
+    sale_date = timezone.now()
+    if line.get('sale_date'):
+        sale_date = parse_datetime(str(line['sale_date']))
+        if sale_date is None:
+            raise ValueError('sale_date must be an ISO 8601 datetime')
+        if timezone.is_naive(sale_date):
+            sale_date = timezone.make_aware(sale_date)
+    return key, str(_as_uuid(product_ref) or product_ref), quantity, sale_date
+
+
+def ingest_sales(lines):
+    """Apply a batch of submitted sales, returning one result dict per line"""
+    if not isinstance(lines, list):
+        raise BatchError('sales must be a list')
+    if len(lines) > max_batch_size():
+        raise BatchError(f'At most {max_batch_size()} sales can be submitted per batch')
+
+    try:
+        return _apply(lines)
+    except IntegrityError:
+        # Another till committed one of these keys concurrently; retrying
+        # reports those lines as duplicates.
+        return _apply(lines)
+
+
+@transaction.atomic
+def _apply(lines):
+    results = [None] * len(lines)
+    parsed = {}
+    for i, line in enumerate(lines):
+        try:
+            parsed[i] = parse_line(line)
+        except ValueError as e:
+            key = line.get('key') if isinstance(line, dict) else None
+            results[i] = {'key': key, 'status': 'error', 'error': str(e)}
+
+    keys = {key for key, _, _, _ in parsed.values()}
+    recorded = dict(SaleIngestKey.objects.filter(key__in=keys).values_list('key', 'sale_id'))
+
+    products = _load_products({ref for _, ref, _, _ in parsed.values()})
+
+    sales, movements, ingest_keys = [], [], []
+    changed = {}
+    for i, (key, product_ref, quantity, sale_date) in parsed.items():
+        if key in recorded:
+            results[i] = {'key': key, 'status': 'duplicate', 'sale_id': str(recorded[key])}
+            continue
+        product = products.get(product_ref)
+        if product is None:
+            results[i] = {'key': key, 'status': 'error', 'error': f'Unknown product {product_ref}'}
+            continue
+
+        try:
+            if product.stock_shards:
+                take_stock(product, quantity, product.price * quantity, sale_date)
+            elif product.stock < quantity:
+                raise InsufficientStock(f"Insufficient stock. Only {product.stock} units available.")
+            else:
+                product.stock -= quantity
+                changed[product.id] = product
+        except InsufficientStock as e:
+            results[i] = {'key': key, 'status': 'error', 'error': str(e)}
+            continue
+
+        sale = Sale(
+            product=product,
+            quantity=quantity,
+            unit_price=product.price,
+            total_price=product.price * quantity,
+            sale_date=sale_date,
+        )
+        sales.append(sale)
+        movements.append(StockMovement(
+            product=product,
+            movement_type='sale',
+            quantity=-quantity,
+            reason=f"Sale #{sale.id}",
+        ))
+        ingest_keys.append(SaleIngestKey(key=key, sale_id=sale.id))
+        recorded[key] = sale.id
+        results[i] = {'key': key, 'status': 'created', 'sale_id': str(sale.id), 'total_price': str(sale.total_price)}
+
+    # bulk_create skips Sale.save, so stock is settled here instead
+    SaleIngestKey.objects.bulk_create(ingest_keys)
+    Sale.objects.bulk_create(sales)
+    if sales:
+        earliest = min(sale.sale_date for sale in sales)
+        transaction.on_commit(lambda: mark_backdated(earliest))
+    StockMovement.objects.bulk_create(movements)
+    now = timezone.now()
+    for product in changed.values():
+        product.updated_at = now
+    Product.objects.bulk_update(changed.values(), ['stock', 'updated_at'])
+    
+    # Sharded products already recorded their sales in the counter slots
+    totals = {}
+    for sale in sales:
+        if sale.product.stock_shards:
+            continue
+        entry = totals.setdefault(sale.product_id, [0, 0, 0, sale.sale_date])
+        entry[0] += sale.quantity
+        entry[1] += sale.total_price
+        entry[2] += 1
+        entry[3] = max(entry[3], sale.sale_date)
+    for product_id, (units, revenue, count, last_sale_at) in totals.items():
+        record_sales(product_id, units, revenue, count, last_sale_at)
+    return results
+
+
+def _as_uuid(ref):
+    try:
+        return uuid.UUID(ref)
+    except ValueError:
+        return None
+
+
+def _load_products(refs):
+    """Products referenced by id or SKU; regular products are locked for the transaction"""
+    ids = {pk for pk in map(_as_uuid, refs) if pk}
+    lookup = Product.objects.filter(id__in=ids) | Product.objects.filter(sku__in=refs)
+    # Hot products sell from their counter slots, so only lock the others
+    locked_ids = [pk for pk, shards in lookup.values_list('id', 'stock_shards') if not shards]
+    found = list(Product.objects.select_for_update().filter(id__in=locked_ids).order_by('id'))
+    found += list(lookup.filter(stock_shards__gt=0))
+
+    products = {}
+    for product in found:
+        products[str(product.id)] = product
+        products[product.sku] = product
+    return products
@@ -0,0 +1,65 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.archive import (
+    DEFAULT_BATCH_SIZE,
+    archive_sales,
+    archive_stock_movements,
+    benchmark_hot_queries,
+    default_cutoff,
+)
+from inventory.models import Sale, StockMovement
+
+class Command(BaseCommand):
+    help = 'Move old sales and stock movements into the archive tables, leaving monthly summaries behind'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive rows older than this date (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, help='Archive rows older than this many days (default: ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, help='Rows moved per transaction (default: ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+        parser.add_argument('--benchmark', action='store_true', help='Time hot-table queries before and after archiving')
+
+    def handle(self, *args, **options):
+        cutoff = self.get_cutoff(options)
+        batch_size = options['batch_size'] or getattr(settings, 'ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        sales_due = Sale.objects.filter(sale_date__lt=cutoff).count()
+        movements_due = StockMovement.objects.filter(created_at__lt=cutoff).count()
+        self.stdout.write(f'Archiving rows older than {timezone.localtime(cutoff):%Y-%m-%d %H:%M}')
+        self.stdout.write(f'{sales_due} sales and {movements_due} stock movements are due')
+        if options['dry_run']:
+            return
+
+        before = benchmark_hot_queries() if options['benchmark'] else None
+
+        sales = archive_sales(cutoff, batch_size)
+        movements = archive_stock_movements(cutoff, batch_size)
+
+        if before is not None:
+            after = benchmark_hot_queries()
+            self.stdout.write('\nHot-table query latency (ms):')
+            for name, elapsed in before.items():
+                self.stdout.write(f'  {name}: {elapsed:.2f} -> {after[name]:.2f}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\nArchived {sales} sales and {movements} stock movements')
+        )
+
+    def get_cutoff(self, options):
+        if options['before'] and options['days'] is not None:
+            raise CommandError('Use either --before or --days, not both')
+        if options['before']:
+            try:
+                day = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD format')
+            return timezone.make_aware(datetime.combine(day, time.min))
+        if options['days'] is not None:
+            return timezone.now() - timedelta(days=options['days'])
+        return default_cutoff()
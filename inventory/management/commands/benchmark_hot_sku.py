@@ -0,0 +1,66 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from inventory.counters import InsufficientStock, fold
+from inventory.models import Product, ProductSalesStats, Sale
+
+class Command(BaseCommand):
+    help = 'Measure concurrent sale throughput on a single product, with and without sharded counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent tills')
+        parser.add_argument('--sales', type=int, default=250, help='Sales recorded per till')
+        parser.add_argument('--shards', type=int, default=8, help='Counter slots for the sharded run')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        sales = options['sales']
+        for shards in (0, options['shards']):
+            product = Product.objects.create(
+                name='Benchmark hot SKU',
+                sku=f'BENCH-{time.time_ns()}',
+                category='clothing_sports',
+                price=Decimal('899.99'),
+                stock=threads * sales,
+            )
+            try:
+                if shards:
+                    fold(product.id, shards=shards)
+                elapsed, failed = self.run(product, threads, sales)
+                stock = fold(product.id, shards=0)
+                recorded = Sale.objects.filter(product=product).count()
+                stats = ProductSalesStats.objects.filter(product=product).first()
+            finally:
+                product.delete()
+
+            label = f'{shards} slots' if shards else 'single row'
+            self.stdout.write(
+                f'{label}: {recorded / elapsed:,.0f} sales/s ({recorded} sales, {failed} failed, {elapsed:.2f}s), '
+                f'final stock {stock} (expected {threads * sales - recorded}), '
+                f'sales stats {stats.sale_count if stats else 0} sales / {stats.units_sold if stats else 0} units'
+            )
+
+    def run(self, product, threads, sales):
+        failures = []
+
+        def till():
+            try:
+                for _ in range(sales):
+                    try:
+                        Sale.objects.create(product=product, quantity=1, unit_price=product.price)
+                    except (InsufficientStock, OperationalError):
+                        failures.append(1)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=till) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - started, len(failures)
@@ -0,0 +1,74 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from inventory.ids import uuid7
+
+class Command(BaseCommand):
+    help = 'Compare insert throughput and index size of random (uuid4) and time-ordered (uuid7) keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help='Rows inserted per key type')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per INSERT batch')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        batch_size = options['batch_size']
+        for label, make_key in (('uuid4', uuid.uuid4), ('uuid7', uuid7)):
+            table = f'inventory_benchmark_{label}'
+            self.create_table(table)
+            try:
+                elapsed = self.fill(table, make_key, rows, batch_size)
+                index_size = self.index_size(table)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(table)}')
+
+            size = f'{index_size / 1024 / 1024:.1f} MB' if index_size is not None else 'n/a'
+            self.stdout.write(
+                f'{label}: {rows / elapsed:,.0f} rows/s ({elapsed:.1f}s), primary key index {size}'
+            )
+
+    def create_table(self, table):
+        uuid_type = models.UUIDField().db_type(connection)
+        int_type = models.IntegerField().db_type(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(table)}')
+            cursor.execute(
+                f'CREATE TABLE {connection.ops.quote_name(table)} '
+                f'(id {uuid_type} PRIMARY KEY, quantity {int_type} NOT NULL)'
+            )
+
+    def fill(self, table, make_key, rows, batch_size):
+        field = models.UUIDField()
+        sql = f'INSERT INTO {connection.ops.quote_name(table)} (id, quantity) VALUES (%s, %s)'
+        started = time.perf_counter()
+        inserted = 0
+        while inserted < rows:
+            size = min(batch_size, rows - inserted)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, [
+                    (field.get_db_prep_value(make_key(), connection), 1) for _ in range(size)
+                ])
+            inserted += size
+        return time.perf_counter() - started
+
+    def index_size(self, table):
+        """Bytes used by the primary key index, where the backend can report it"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_indexes_size(%s)', [table])
+                return cursor.fetchone()[0]
+            if connection.vendor == 'sqlite':
+                try:
+                    cursor.execute(
+                        "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                        "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                        [table],
+                    )
+                except Exception:
+                    return None  # SQLite built without the dbstat virtual table
+                return cursor.fetchone()[0]
+        return None
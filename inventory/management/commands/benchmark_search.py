@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventory.models import Product
+from inventory.search import invalidate, suggest
+
+WORDS = [
+    'rooibos', 'biltong', 'braai', 'protea', 'springbok', 'karoo', 'fynbos', 'marula', 'baobab', 'kudu',
+    'amarula', 'chakalaka', 'boerewors', 'koeksister', 'rusks', 'mielie', 'ostrich', 'sunbird', 'jacaranda', 'aloe',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure typeahead latency (p50/p95) on a generated catalogue, rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500_000, help='Products generated for the run')
+        parser.add_argument('--queries', type=int, default=2000, help='Suggestion queries timed per pass')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Products per INSERT batch')
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['queries'] < 1:
+            raise CommandError('--products and --queries must be at least 1')
+        rng = random.Random(0)
+        with transaction.atomic():
+            names = self.fill(rng, options['products'], options['batch_size'])
+            queries = []
+            for _ in range(options['queries']):
+                source = rng.choice(names)
+                queries.append(source[:rng.randint(1, min(6, len(source)))])
+
+            # Cold: every lookup goes to the database; warm: repeated prefixes come from the cache
+            invalidate()
+            self.report('cold', [self.timed(query, cold=True) for query in queries])
+            self.report('warm', [self.timed(query) for query in queries])
+            invalidate()
+            transaction.set_rollback(True)
+
+    def fill(self, rng, count, batch_size):
+        names = []
+        started = time.perf_counter()
+        for start in range(0, count, batch_size):
+            batch = []
+            for i in range(start, min(start + batch_size, count)):
+                name = f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}'
+                sku = f'BENCH{i:07}'
+                names.append(name.lower() if i % 2 else sku.lower())
+                batch.append(Product(name=name, sku=sku, category='home_living', price=1, stock=i % 50))
+            Product.objects.bulk_create(batch)
+        self.stdout.write(f'Generated {count:,} products in {time.perf_counter() - started:.1f}s')
+        return names
+
+    def timed(self, query, cold=False):
+        if cold:
+            invalidate()
+        started = time.perf_counter()
+        suggest(query)
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, label, timings):
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f'{label}: p50 {p50:.2f} ms, p95 {p95:.2f} ms, max {timings[-1]:.2f} ms')
@@ -0,0 +1,102 @@
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.analytics import (
+    COLUMNS,
+    SalesSnapshot,
+    write_json,
+    append_snapshot,
+    build_snapshot,
+    default_path,
+    write_columns,
+)
+from inventory.models import Product
+
+BENCHMARK_ROWS = 50_000_000
+BENCHMARK_PRODUCTS = 10_000
+
+class Command(BaseCommand):
+    help = 'Export sales into the columnar, memory-mapped analytics snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Snapshot directory (default: ANALYTICS_SNAPSHOT_DIR)')
+        parser.add_argument('--append', action='store_true', help='Only append sales recorded since the last run')
+        parser.add_argument(
+            '--benchmark', type=int, nargs='?', const=BENCHMARK_ROWS, metavar='ROWS',
+            help=f'Time report queries over a synthetic snapshot (default: {BENCHMARK_ROWS} rows)'
+        )
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self.benchmark(options['benchmark'])
+            return
+
+        path = Path(options['path'] or default_path())
+        started = time.perf_counter()
+        if options['append']:
+            rows = append_snapshot(path)
+            self.stdout.write(f'Appended {rows} sales')
+        else:
+            rows = build_snapshot(path)
+            self.stdout.write(f'Exported {rows} sales')
+        elapsed = time.perf_counter() - started
+
+        snapshot = SalesSnapshot(path)
+        self.stdout.write(
+            self.style.SUCCESS(f'Snapshot in {path} holds {snapshot.rows} sales ({elapsed:.2f}s)')
+        )
+
+    def benchmark(self, rows):
+        categories = [code for code, _ in Product.CATEGORY_CHOICES]
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp)
+            self.stdout.write(f'Generating {rows} synthetic sales in {path}...')
+            write_json(path / 'products.json', [
+                {'id': str(i), 'name': f'Product {i}', 'sku': f'SKU{i:06d}', 'category': categories[i % len(categories)]}
+                for i in range(BENCHMARK_PRODUCTS)
+            ])
+            written = 0
+            start = int(time.time()) - 3 * 365 * 24 * 3600
+            step = 3 * 365 * 24 * 3600 / rows
+            while written < rows:
+                size = min(5_000_000, rows - written)
+                dates = start + (np.arange(written, written + size) * step).astype(np.int64)
+                quantity = rng.integers(1, 6, size, dtype=np.int32)
+                write_columns(path, written, {
+                    'sale_date': dates,
+                    'product': rng.integers(0, BENCHMARK_PRODUCTS, size, dtype=np.int32),
+                    'quantity': quantity,
+                    'revenue_cents': quantity.astype(np.int64) * rng.integers(100, 100_000, size),
+                })
+                written += size
+            write_json(path / 'meta.json', {'rows': rows, 'watermark': None, 'watermark_ids': []})
+
+            snapshot = SalesSnapshot(path)
+            # Touch every column once so the timings measure NumPy, not the first page-in
+            for name in COLUMNS:
+                snapshot.columns[name].sum()
+
+            started = time.perf_counter()
+            snapshot.top_products()
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'  first query, including monthly rollup: {elapsed:.1f} ms')
+
+            quarter_ago = timezone.now() - timedelta(days=90)
+            queries = {
+                'category totals': snapshot.category_totals,
+                'top 10 products': snapshot.top_products,
+                'top 10 products, last 90 days': lambda: snapshot.top_products(start=quarter_ago),
+                'monthly totals': snapshot.monthly_totals,
+            }
+            for name, query in queries.items():
+                started = time.perf_counter()
+                query()
+                elapsed = (time.perf_counter() - started) * 1000
+                self.stdout.write(f'  {name}: {elapsed:.1f} ms')
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.counters import fold, fold_all
+from inventory.models import Product
+
+class Command(BaseCommand):
+    help = 'Fold sharded stock counters back into Product.stock, or switch sharding on or off for a product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enable', metavar='SKU', help='Start selling this product from counter slots')
+        parser.add_argument('--shards', type=int, help='Slots for --enable (default: STOCK_COUNTER_SHARDS)')
+        parser.add_argument('--disable', metavar='SKU', help='Fold this product and stop using counter slots')
+
+    def handle(self, *args, **options):
+        if options['enable'] and options['disable']:
+            raise CommandError('Use either --enable or --disable, not both')
+
+        if options['enable']:
+            shards = options['shards'] or getattr(settings, 'STOCK_COUNTER_SHARDS', 8)
+            if shards < 1:
+                raise CommandError('--shards must be at least 1')
+            product = self.get_product(options['enable'])
+            stock = fold(product.id, shards=shards)
+            self.stdout.write(self.style.SUCCESS(f'{product.name}: {stock} units spread over {shards} slots'))
+            return
+
+        if options['disable']:
+            product = self.get_product(options['disable'])
+            stock = fold(product.id, shards=0)
+            self.stdout.write(self.style.SUCCESS(f'{product.name}: counter slots removed, {stock} units in stock'))
+            return
+
+        folded = fold_all()
+        self.stdout.write(self.style.SUCCESS(f'Folded stock counters for {folded} products'))
+
+    def get_product(self, sku):
+        try:
+            return Product.objects.get(sku=sku)
+        except Product.DoesNotExist:
+            raise CommandError(f'No product with SKU {sku}')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from inventory.stats import rebuild
+
+class Command(BaseCommand):
+    help = 'Recompute per-product sales statistics from live and archived sales'
+
+    def handle(self, *args, **options):
+        products = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales statistics for {products} products'))
@@ -0,0 +1,80 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from inventory.ids import is_time_ordered, rekey
+from inventory.models import ArchivedStockMovement, Sale, StockMovement
+
+class Command(BaseCommand):
+    help = 'Replace random (uuid4) Sale and StockMovement keys with time-ordered (uuid7) keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows re-keyed per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        # New keys are derived from the old key and its timestamp, so sale
+        # references can be rewritten before the sales themselves and an
+        # interrupted run can simply be started again.
+        links = self.relink_sale_movements(StockMovement, batch_size)
+        links += self.relink_sale_movements(ArchivedStockMovement, batch_size)
+        sales = self.rekey(Sale, 'sale_date', batch_size)
+        movements = self.rekey(StockMovement, 'created_at', batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Re-keyed {sales} sales and {movements} stock movements, '
+                f'updated {links} sale references'
+            )
+        )
+
+    def batches(self, queryset, date_field, batch_size):
+        """Yield ``(id, date)`` batches in key order, resuming after the last row seen"""
+        last = None
+        while True:
+            page = queryset.order_by(date_field, 'id')
+            if last is not None:
+                page = page.filter(Q(**{f'{date_field}__gt': last[1]}) | Q(**{date_field: last[1], 'id__gt': last[0]}))
+            batch = list(page.values_list('id', date_field)[:batch_size])
+            if not batch:
+                return
+            last = batch[-1]
+            yield batch
+
+    def rekey(self, model, date_field, batch_size):
+        rekeyed = 0
+        for batch in self.batches(model.objects.all(), date_field, batch_size):
+            with transaction.atomic():
+                for pk, when in batch:
+                    if is_time_ordered(pk):
+                        continue
+                    model.objects.filter(id=pk).update(id=rekey(pk, when))
+                    rekeyed += 1
+        return rekeyed
+
+    def relink_sale_movements(self, model, batch_size):
+        """Point ``Sale #<id>`` movement reasons at the sale's future time-ordered key"""
+        movements = model.objects.filter(movement_type='sale', reason__startswith='Sale #')
+        relinked = 0
+        for batch in self.batches(movements, 'created_at', batch_size):
+            reasons = dict(model.objects.filter(id__in=[pk for pk, _ in batch]).values_list('id', 'reason'))
+            sale_ids = {}
+            for pk, reason in reasons.items():
+                try:
+                    sale_id = uuid.UUID(reason.removeprefix('Sale #'))
+                except ValueError:
+                    continue
+                if not is_time_ordered(sale_id):
+                    sale_ids[pk] = sale_id
+            sale_dates = dict(Sale.objects.filter(id__in=sale_ids.values()).values_list('id', 'sale_date'))
+            with transaction.atomic():
+                for pk, sale_id in sale_ids.items():
+                    if sale_id in sale_dates:
+                        model.objects.filter(id=pk).update(reason=f'Sale #{rekey(sale_id, sale_dates[sale_id])}')
+                        relinked += 1
+        return relinked
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.snapshots import take_snapshots
+
+class Command(BaseCommand):
+    help = 'Store end-of-day stock levels for every product (schedule nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to snapshot, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--backfill', type=int, default=1, help='Also snapshot this many days up to --date')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+        if options['backfill'] < 1:
+            raise CommandError('--backfill must be at least 1')
+
+        days = [day - timedelta(days=offset) for offset in range(options['backfill'])]
+        rows = take_snapshots(days)
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored {rows} stock snapshots for {min(days)} to {max(days)}')
+        )
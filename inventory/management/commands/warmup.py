@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from inventory.warmup import WARMUP_PAGES, warm_up
+
+class Command(BaseCommand):
+    help = 'Pre-render templates, build the URL resolver and prime caches and hot indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--measure', type=int, metavar='N',
+            help='Compare latency of the first N requests in fresh processes, without and with warm-up'
+        )
+        # Internal: run inside the fresh process started by --measure
+        parser.add_argument('--probe', type=int, help=argparse.SUPPRESS)
+        parser.add_argument('--no-warmup', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['probe']:
+            self.probe(options['probe'], warm=not options['no_warmup'])
+            return
+        if options['measure']:
+            self.measure(options['measure'])
+            return
+
+        for step, elapsed in warm_up():
+            self.stdout.write(f'  {step}: {elapsed:.1f} ms')
+        self.stdout.write(self.style.SUCCESS('Warm-up complete'))
+
+    def measure(self, requests):
+        if requests < 1:
+            raise CommandError('--measure must be at least 1')
+        results = {}
+        for label, extra in (('cold', ['--no-warmup']), ('warmed', [])):
+            output = subprocess.run(
+                [sys.executable, sys.argv[0], 'warmup', '--probe', str(requests), *extra],
+                capture_output=True, text=True, check=True,
+                env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)},
+            ).stdout
+            results[label] = json.loads(output.strip().splitlines()[-1])
+
+        self.stdout.write(f'First {requests} requests (ms), fresh process each:')
+        for label, timings in results.items():
+            self.stdout.write(
+                f'  {label}: first {timings[0]:.1f}, mean {sum(timings) / len(timings):.1f}, '
+                f'max {max(timings):.1f}, total {sum(timings):.1f}'
+            )
+
+    def probe(self, requests, warm):
+        if warm:
+            warm_up()
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'testserver')
+        client = Client(SERVER_NAME=host)
+        urls = [reverse(name) for name in WARMUP_PAGES]
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            client.get(urls[i % len(urls)])
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(json.dumps(timings))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:11
+
+import inventory.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_archive_history'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='id',
+            field=models.UUIDField(default=inventory.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='id',
+            field=models.UUIDField(default=inventory.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='id',
+            field=models.UUIDField(default=inventory.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Counter slots used for sales of hot products (0 = off)'),
+        ),
+        migrations.CreateModel(
+            name='StockCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('allocated', models.PositiveIntegerField(default=0)),
+                ('remaining', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='inventory.product')),
+            ],
+            options={
+                'ordering': ['product', 'slot'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'slot'), name='unique_counter_shard_slot')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:20
+
+import django.db.models.deletion
+import inventory.stats
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def populate_stats(apps, schema_editor):
+    ProductSalesStats = apps.get_model('inventory', 'ProductSalesStats')
+    totals = inventory.stats.collect(
+        sale_model=apps.get_model('inventory', 'Sale'),
+        archived_sale_model=apps.get_model('inventory', 'ArchivedSale'),
+        summary_model=apps.get_model('inventory', 'SalesPeriodSummary'),
+    )
+    ProductSalesStats.objects.bulk_create([
+        ProductSalesStats(product_id=product_id, **stats) for product_id, stats in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_sale_ingest_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_stats', serialize=False, to='inventory.product')),
+                ('units_sold', models.PositiveIntegerField(db_index=True, default=0)),
+                ('revenue', models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('last_sale_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'product sales stats',
+                'ordering': ['-revenue'],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_product_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockcountershard',
+            name='last_sale_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockcountershard',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='stockcountershard',
+            name='sale_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,8 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Lower
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.utils import timezone
-import uuid
+from .ids import uuid7
+
+class ProductQuerySet(models.QuerySet):
+    def with_available_stock(self):
+        """Annotate ``live_stock``, the stock net of sales still held in counter slots"""
+        unfolded = StockCounterShard.objects.filter(product=OuterRef('pk')).values('product').annotate(
+            consumed=Sum(F('allocated') - F('remaining'))
+        ).values('consumed')
+        return self.annotate(
+            live_stock=F('stock') - Coalesce(Subquery(unfolded, output_field=models.IntegerField()), 0)
+        )
 
 class Product(models.Model):
     CATEGORY_CHOICES = [
@@ -14,7 +27,7 @@ class Product(models.Model):
         ('electronics', 'Electronics'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=200)
     sku = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True, null=True)
@@ -22,22 +35,47 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     stock = models.PositiveIntegerField(default=0)
     low_stock_threshold = models.PositiveIntegerField(default=10)
+    stock_shards = models.PositiveSmallIntegerField(default=0, help_text='Counter slots used for sales of hot products (0 = off)')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Prefix range scans for typeahead search (see inventory.search)
+            models.Index(Lower('name'), name='product_name_lower_idx'),
+            models.Index(Lower('sku'), name='product_sku_lower_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.sku})"
     
+    def clean(self):
+        if self.stock_shards and not self._state.adding:
+            from .counters import unfolded_sales
+            sold = unfolded_sales(self)
+            if self.stock < sold:
+                raise ValidationError({
+                    'stock': f"{sold} units have already been sold from the counter slots; stock cannot be set below that."
+                })
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Restocks and corrections of a hot product reach its counter slots by folding
+            if self.stock_shards:
+                from .counters import fold
+                self.stock = fold(self.id)
+    
     @property
     def is_low_stock(self):
-        return self.stock <= self.low_stock_threshold
+        return self.available_stock <= self.low_stock_threshold
     
     @property
     def is_out_of_stock(self):
-        return self.stock == 0
+        return self.available_stock == 0
     
     @property
     def stock_status(self):
@@ -49,15 +87,25 @@ class Product(models.Model):
     
     @property
     def total_value(self):
-        return float(self.price) * self.stock
+        return float(self.price) * self.available_stock
+    
+    @property
+    def available_stock(self):
+        """Stock including sales not yet folded back from the counter slots"""
+        if not self.stock_shards:
+            return self.stock
+        if 'live_stock' in self.__dict__:
+            return self.live_stock  # From Product.objects.with_available_stock()
+        from .counters import unfolded_sales
+        return self.stock - unfolded_sales(self)
 
 class Sale(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales')
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
-    sale_date = models.DateTimeField(default=timezone.now)
+    sale_date = models.DateTimeField(default=timezone.now, db_index=True)
     
     class Meta:
         ordering = ['-sale_date']
@@ -68,13 +116,70 @@ class Sale(models.Model):
     def save(self, *args, **kwargs):
         # Auto-calculate total price
         self.total_price = float(self.unit_price) * self.quantity
-        super().save(*args, **kwargs)
         
-        # Update product stock
-        if self.product_id:
-            product = Product.objects.get(id=self.product_id)
-            product.stock = max(0, product.stock - self.quantity)
-            product.save()
+        with transaction.atomic():
+            # Hot products take stock from their counter slots instead of the Product row
+            product = Product.objects.get(id=self.product_id) if self.product_id else None
+            sharded = bool(product and product.stock_shards)
+            if sharded:
+                from .counters import take_stock
+                take_stock(product, self.quantity, self.total_price, self.sale_date)
+            elif product:
+                # Conditional decrement, so concurrent sales can neither oversell nor overwrite each other
+                if not Product.objects.filter(id=product.id, stock__gte=self.quantity).update(
+                    stock=F('stock') - self.quantity, updated_at=timezone.now()
+                ):
+                    from .counters import InsufficientStock
+                    available = Product.objects.values_list('stock', flat=True).get(id=product.id)
+                    raise InsufficientStock(f"Insufficient stock. Only {available} units available.")
+            
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            
+            if adding and self.product_id:
+                # A hot product's statistics ride along in its counter slot until the next fold
+                if not sharded:
+                    from .stats import record_sales
+                    record_sales(self.product_id, self.quantity, self.total_price, 1, self.sale_date)
+                
+                from .analytics import mark_backdated
+                sale_date = self.sale_date
+                transaction.on_commit(lambda: mark_backdated(sale_date))
+
+class ProductSalesStats(models.Model):
+    """Lifetime sales totals per product, kept current as sales are recorded"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='sales_stats')
+    units_sold = models.PositiveIntegerField(default=0, db_index=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), db_index=True)
+    sale_count = models.PositiveIntegerField(default=0)
+    last_sale_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-revenue']
+        verbose_name_plural = 'product sales stats'
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.units_sold} units (R{self.revenue})"
+
+class StockCounterShard(models.Model):
+    """One slot of a hot product's stock; see inventory.counters"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='counter_shards')
+    slot = models.PositiveSmallIntegerField()
+    allocated = models.PositiveIntegerField(default=0)  # Stock handed to the slot at the last fold
+    remaining = models.PositiveIntegerField(default=0)  # Still available for sale
+    # Sales statistics gathered since the last fold; fold() adds them to ProductSalesStats
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    sale_count = models.PositiveIntegerField(default=0)
+    last_sale_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['product', 'slot']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'slot'], name='unique_counter_shard_slot'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} slot {self.slot} ({self.remaining}/{self.allocated})"
 
 class StockMovement(models.Model):
     MOVEMENT_TYPES = [
@@ -84,15 +189,109 @@ class StockMovement(models.Model):
         ('sale', 'Sale'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
     movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
     quantity = models.IntegerField()  # Can be negative for outgoing stock
     reason = models.CharField(max_length=200, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.product.name} - {self.movement_type} ({self.quantity})"
+
+class StockSnapshot(models.Model):
+    """Stock level of a product at the end of a day; see inventory.snapshots"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    date = models.DateField(db_index=True)
+    stock = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_stock_snapshot_date'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.date} ({self.stock})"
+
+class SaleIngestKey(models.Model):
+    """Idempotency key of a sale submitted through the batch ingest endpoint"""
+    key = models.CharField(max_length=100, unique=True)
+    sale_id = models.UUIDField()  # Not a foreign key, so archiving the sale keeps the key
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.key} -> Sale #{self.sale_id}"
+
+class ArchivedSale(models.Model):
+    """Sale rows moved out of the live table by the archive_history command"""
+    id = models.UUIDField(primary_key=True, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_sales')
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    sale_date = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-sale_date']
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.quantity} units (R{self.total_price}, archived)"
+
+class ArchivedStockMovement(models.Model):
+    """Stock movement rows moved out of the live table by the archive_history command"""
+    id = models.UUIDField(primary_key=True, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_stock_movements')
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MOVEMENT_TYPES)
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=200, blank=True, null=True)
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.movement_type} ({self.quantity}, archived)"
+
+class SalesPeriodSummary(models.Model):
+    """Monthly per-product sales totals for archived Sale rows"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_summaries')
+    period = models.DateField()  # First day of the month
+    sale_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.PositiveIntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    
+    class Meta:
+        ordering = ['-period']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'period'], name='unique_sales_summary_period'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.period:%Y-%m} (R{self.total_sales})"
+
+class StockMovementPeriodSummary(models.Model):
+    """Monthly per-product net stock movement for archived StockMovement rows"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movement_summaries')
+    period = models.DateField()  # First day of the month
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MOVEMENT_TYPES)
+    movement_count = models.PositiveIntegerField(default=0)
+    net_quantity = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-period']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'period', 'movement_type'], name='unique_movement_summary_period'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.period:%Y-%m} {self.movement_type} ({self.net_quantity})"
@@ -0,0 +1,121 @@
+"""
+Typeahead product search.
+
+Suggestions come from prefix range scans on the ``LOWER(name)`` and
+``LOWER(sku)`` expression indexes, so a lookup reads only the handful of
+index entries it returns instead of scanning the catalogue with
+``icontains``. Matches are kept in a small per-process LRU cache; stock is
+left out of it and read fresh for the few products returned, so sales never
+touch the cache. Saving or deleting a Product drops just the cached prefixes
+it can affect: those listing it and those its name or SKU starts with. The
+TTL bounds how stale a cache in another worker process can get.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.functions import Lower
+from django.urls import reverse
+
+from .models import Product
+
+# Sorts after any character, so [prefix, prefix + PREFIX_END) spans every match
+PREFIX_END = '\U0010ffff'
+MAX_QUERY_LENGTH = 100
+
+_cache = OrderedDict()
+_generation = 0
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _prefix_matches(field, prefix, limit):
+    return list(
+        Product.objects.alias(key=Lower(field))
+        .filter(key__gte=prefix, key__lt=prefix + PREFIX_END)
+        .order_by('key')
+        .only('id', 'name', 'sku')[:limit]
+    )
+
+
+def lookup(prefix, limit):
+    """Products whose name or SKU starts with ``prefix`` (lowercase), names first, without stock"""
+    products = {}
+    for product in _prefix_matches('name', prefix, limit) + _prefix_matches('sku', prefix, limit):
+        products.setdefault(product.id, product)
+    return [
+        {
+            'id': str(product.id),
+            'name': product.name,
+            'sku': product.sku,
+            'url': reverse('product_detail', args=[product.id]),
+        }
+        for product in list(products.values())[:limit]
+    ]
+
+
+def with_stock(results):
+    """Suggestions with each product's current available stock, dropping deleted products"""
+    if not results:
+        return results
+    stock = {
+        str(product_id): level
+        for product_id, level in Product.objects.with_available_stock().filter(
+            id__in=[result['id'] for result in results]
+        ).values_list('id', 'live_stock')
+    }
+    return [{**result, 'stock': stock[result['id']]} for result in results if result['id'] in stock]
+
+
+def suggest(query):
+    """Cached typeahead suggestions for a search box query"""
+    global _generation
+    prefix = query.strip().lower()[:MAX_QUERY_LENGTH]
+    if not prefix:
+        return []
+
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(prefix)
+        if cached and cached[0] > now:
+            _cache.move_to_end(prefix)
+            return with_stock(cached[1])
+        generation = _generation
+
+    results = lookup(prefix, _setting('TYPEAHEAD_RESULTS', 8))
+
+    with _lock:
+        # Skip caching if products changed while the lookup ran
+        if generation == _generation:
+            _cache[prefix] = (now + _setting('TYPEAHEAD_CACHE_TTL', 30), results)
+            _cache.move_to_end(prefix)
+            while len(_cache) > _setting('TYPEAHEAD_CACHE_SIZE', 1024):
+                _cache.popitem(last=False)
+    return with_stock(results)
+
+
+def invalidate(instance=None, update_fields=None, **kwargs):
+    """Drop cached suggestions a saved or deleted product can change, or all without one
+
+    Connected to Product post_save/post_delete.
+    """
+    global _generation
+    if update_fields is not None and not {'name', 'sku'} & set(update_fields):
+        return  # Only name and SKU are cached
+    with _lock:
+        _generation += 1
+        if instance is None:
+            _cache.clear()
+            return
+        product_id = str(instance.pk)
+        keys = [value.lower() for value in (instance.name, instance.sku) if value]
+        stale = [
+            prefix for prefix, (_, results) in _cache.items()
+            if any(key.startswith(prefix) for key in keys) or any(result['id'] == product_id for result in results)
+        ]
+        for prefix in stale:
+            del _cache[prefix]
@@ -0,0 +1,124 @@
+"""
+Point-in-time stock levels.
+
+The snapshot_stock command stores each product's stock at the end of a day
+(local time) as StockSnapshot rows. ``stock_as_of`` answers "stock at T" for
+every product from the snapshot closest to T, adjusted by the stock movements
+between that snapshot and T, so only a bounded range of the movement history
+is ever scanned. Archived movements are included in those ranges.
+
+A snapshot for day D covers every movement created before midnight at the
+end of D; the stock at T covers every movement created at or before T.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .counters import unfolded_sales_by_product
+from .models import ArchivedStockMovement, Product, StockMovement, StockSnapshot
+
+# Above this many uncovered products, replay them without an IN (...) filter
+MISSING_LOOKUP_LIMIT = 500
+
+
+def end_of_day(day):
+    """Aware datetime of the midnight that ends ``day``"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def current_stock():
+    """Live stock per product id, counting sales still held in counter slots"""
+    unfolded = unfolded_sales_by_product()
+    return {
+        product_id: max(0, stock - unfolded.get(product_id, 0))
+        for product_id, stock in Product.objects.values_list('id', 'stock')
+    }
+
+
+def movement_totals(**filters):
+    """Net movement per product id over live and archived movements matching ``filters``"""
+    totals = {}
+    for model in (StockMovement, ArchivedStockMovement):
+        for product_id, quantity in model.objects.filter(**filters).values('product').annotate(
+            total=Sum('quantity')
+        ).values_list('product', 'total'):
+            totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+def take_snapshots(days):
+    """Store end-of-day stock for each of ``days``, returning the rows written
+
+    The most recent day is derived from current stock and the movements since
+    its end; each earlier day from the following one, so every step reads a
+    single day of movements.
+    """
+    days = sorted(set(days), reverse=True)
+    if not days:
+        return 0
+    stock = current_stock()
+    created = dict(Product.objects.values_list('id', 'created_at'))
+    boundary = timezone.now()
+    written = 0
+    for day in days:
+        day_end = end_of_day(day)
+        if day_end > boundary:
+            continue  # The day has not finished yet
+        later = movement_totals(created_at__gte=day_end, created_at__lt=boundary)
+        stock = {product_id: level - later.get(product_id, 0) for product_id, level in stock.items()}
+        boundary = day_end
+
+        snapshots = [
+            StockSnapshot(product_id=product_id, date=day, stock=level)
+            for product_id, level in stock.items() if created[product_id] < day_end
+        ]
+        StockSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=5000,
+            update_conflicts=True,
+            unique_fields=['product', 'date'],
+            update_fields=['stock'],
+        )
+        written += len(snapshots)
+    return written
+
+
+def stock_as_of(when):
+    """Stock per product id at ``when`` for every product that existed by then"""
+    products = set(Product.objects.filter(created_at__lte=when).values_list('id', flat=True))
+    local_day = timezone.localtime(when).date()
+    before = StockSnapshot.objects.filter(date__lt=local_day).aggregate(day=Max('date'))['day']
+    after = StockSnapshot.objects.filter(date__gte=local_day).aggregate(day=Min('date'))['day']
+
+    # Start from whichever snapshot is nearer to ``when``
+    candidates = []
+    if before is not None:
+        candidates.append((when - end_of_day(before), before))
+    if after is not None:
+        candidates.append((end_of_day(after) - when, after))
+    if candidates:
+        _, day = min(candidates)
+        day_end = end_of_day(day)
+        stock = dict(StockSnapshot.objects.filter(date=day).values_list('product', 'stock'))
+        if day_end <= when:
+            moved = movement_totals(created_at__gte=day_end, created_at__lte=when)
+            stock = {product_id: level + moved.get(product_id, 0) for product_id, level in stock.items()}
+        else:
+            moved = movement_totals(created_at__gt=when, created_at__lt=day_end)
+            stock = {product_id: level - moved.get(product_id, 0) for product_id, level in stock.items()}
+    else:
+        stock = {}
+
+    # Products the snapshot does not cover are replayed back from their current stock
+    missing = products - stock.keys()
+    if missing:
+        live = current_stock()
+        if len(missing) <= MISSING_LOOKUP_LIMIT:
+            moved = movement_totals(product__in=missing, created_at__gt=when)
+        else:
+            moved = movement_totals(created_at__gt=when)
+        for product_id in missing:
+            stock[product_id] = live[product_id] - moved.get(product_id, 0)
+
+    return {product_id: level for product_id, level in stock.items() if product_id in products}
@@ -0,0 +1,93 @@
+"""
+Denormalized per-product sales statistics.
+
+ProductSalesStats holds lifetime units sold, revenue, sale count and last sale
+time for each product. Every code path that records sales calls
+``record_sales`` inside its own transaction, so the totals move in step with
+the Sale rows and rankings become an indexed ``ORDER BY`` instead of a
+``GROUP BY`` over the whole history. ``rebuild`` recomputes everything from
+live sales plus the archive, for drift repair.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ArchivedSale, ProductSalesStats, Sale, SalesPeriodSummary, StockCounterShard
+
+
+def record_sales(product_id, units, revenue, count, last_sale_at):
+    """Add sales to a product's totals with F() updates, creating the row on first sale"""
+    revenue = Decimal(str(revenue)).quantize(Decimal('0.01'))
+    for _ in range(2):
+        updated = ProductSalesStats.objects.filter(product_id=product_id).update(
+            units_sold=F('units_sold') + units,
+            revenue=F('revenue') + revenue,
+            sale_count=F('sale_count') + count,
+            last_sale_at=Greatest(Coalesce('last_sale_at', Value(last_sale_at)), Value(last_sale_at)),
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                ProductSalesStats.objects.create(
+                    product_id=product_id,
+                    units_sold=units,
+                    revenue=revenue,
+                    sale_count=count,
+                    last_sale_at=last_sale_at,
+                )
+            return
+        except IntegrityError:
+            continue  # Created concurrently by another sale; update it instead
+
+
+def collect(sale_model=Sale, archived_sale_model=ArchivedSale, summary_model=SalesPeriodSummary):
+    """Fresh totals per product id from live sales, archived sales and their summaries
+
+    The models can be swapped for historical ones, as the 0006 migration does.
+    """
+    totals = {}
+
+    def entry(product_id):
+        return totals.setdefault(product_id, {
+            'units_sold': 0, 'revenue': Decimal('0'), 'sale_count': 0, 'last_sale_at': None,
+        })
+
+    for row in sale_model.objects.values('product').annotate(
+        units=Sum('quantity'), revenue=Sum('total_price'), count=Count('id'), last=Max('sale_date')
+    ):
+        stats = entry(row['product'])
+        stats['units_sold'] += row['units']
+        stats['revenue'] += row['revenue']
+        stats['sale_count'] += row['count']
+        stats['last_sale_at'] = row['last']
+
+    for row in summary_model.objects.values('product').annotate(
+        units=Sum('total_quantity'), revenue=Sum('total_sales'), count=Sum('sale_count')
+    ):
+        stats = entry(row['product'])
+        stats['units_sold'] += row['units']
+        stats['revenue'] += row['revenue']
+        stats['sale_count'] += row['count']
+
+    for row in archived_sale_model.objects.values('product').annotate(last=Max('sale_date')):
+        stats = entry(row['product'])
+        if stats['last_sale_at'] is None or row['last'] > stats['last_sale_at']:
+            stats['last_sale_at'] = row['last']
+
+    return totals
+
+
+@transaction.atomic
+def rebuild():
+    """Replace every product's totals with freshly computed ones, returning the row count"""
+    totals = collect()
+    # Those totals already include the sales held in counter slots
+    StockCounterShard.objects.update(revenue=Decimal('0'), sale_count=0, last_sale_at=None)
+    ProductSalesStats.objects.all().delete()
+    ProductSalesStats.objects.bulk_create([
+        ProductSalesStats(product_id=product_id, **stats) for product_id, stats in totals.items()
+    ])
+    return len(totals)
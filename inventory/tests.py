@@ -1,3 +1,774 @@
-from django.test import TestCase
+import json
+import tempfile
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ingest, search, snapshots
+from .analytics import SalesSnapshot, append_snapshot, build_snapshot
+from .classification import _as_id_text, _id_array, _positions, build_report
+from .archive import archive_sales, archive_stock_movements
+from .counters import InsufficientStock, fold, unfolded_sales
+from .ids import is_time_ordered, rekey, uuid7
+from .models import (
+    ArchivedStockMovement, Product, ProductSalesStats, Sale, SaleIngestKey, SalesPeriodSummary, StockMovement,
+    StockSnapshot,
+)
+from .snapshots import stock_as_of, take_snapshots
+from .stats import rebuild, record_sales
+
+
+def make_product(**kwargs):
+    defaults = {
+        'name': 'Rooibos Tea',
+        'sku': 'TEA001',
+        'category': 'food_beverages',
+        'price': Decimal('45.00'),
+        'stock': 10,
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(**defaults)
+
+
+def sell(product, quantity):
+    return Sale.objects.create(product=product, quantity=quantity, unit_price=product.price)
+
+
+class ShardedStockTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=4)
+        fold(self.product.id, shards=2)
+        self.product.refresh_from_db()
+
+    def test_restock_reaches_counter_slots(self):
+        sell(self.product, 4)
+        self.assertEqual(self.product.available_stock, 0)
+
+        self.product.stock += 20
+        self.product.save()
+
+        self.assertEqual(self.product.available_stock, 20)
+        sell(self.product, 15)
+        self.assertEqual(self.product.available_stock, 5)
+
+    def test_restock_through_record_sale_view(self):
+        sell(self.product, 4)
+        self.product.stock += 20
+        self.product.save()
+
+        self.client.post(reverse('record_sale'), {'product_id': self.product.id, 'quantity': 20})
+
+        self.assertEqual(Sale.objects.filter(product=self.product).count(), 2)
+        self.assertEqual(self.product.available_stock, 0)
+
+    def test_stock_cut_blocks_sales(self):
+        self.product.stock = 0
+        self.product.save()
+
+        with self.assertRaises(InsufficientStock):
+            sell(self.product, 1)
+        self.assertEqual(self.product.available_stock, 0)
+
+    def test_never_sells_more_than_stock(self):
+        sell(self.product, 3)
+        with self.assertRaises(InsufficientStock):
+            sell(self.product, 2)
+        sell(self.product, 1)
+        with self.assertRaises(InsufficientStock):
+            sell(self.product, 1)
+
+        self.assertEqual(fold(self.product.id), 0)
+        self.assertEqual(Sale.objects.filter(product=self.product).count(), 2)
+
+    def test_stock_cannot_be_set_below_unfolded_sales(self):
+        sell(self.product, 3)
+        self.product.stock = 2
+
+        with self.assertRaises(ValidationError):
+            self.product.full_clean()
+        with self.assertRaises(InsufficientStock):
+            self.product.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.available_stock, 1)
+
+    def test_sales_stats_kept_in_slots_until_fold(self):
+        with CaptureQueriesContext(connection) as queries:
+            sell(self.product, 1)
+        self.assertFalse([q for q in queries if 'inventory_productsalesstats' in q['sql']])
+        sell(self.product, 2)
+        self.assertFalse(ProductSalesStats.objects.filter(product=self.product).exists())
+
+        fold(self.product.id)
+
+        stats = ProductSalesStats.objects.get(product=self.product)
+        self.assertEqual((stats.units_sold, stats.revenue, stats.sale_count), (3, Decimal('135.00'), 2))
+        self.assertEqual(stats.last_sale_at, Sale.objects.latest('sale_date').sale_date)
+        fold(self.product.id)
+        stats.refresh_from_db()
+        self.assertEqual(stats.sale_count, 2)
+
+
+class ProductAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.product = make_product(stock=10)
+        fold(self.product.id, shards=2)
+        self.product.refresh_from_db()
+        sell(self.product, 4)
+        self.url = reverse('admin:inventory_product_change', args=[self.product.id])
+
+    def test_change_form_shows_available_stock_without_folding(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.context['adminform'].form.initial['stock'], 6)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, unfolded_sales(self.product)), (10, 4))
+
+    def test_saved_stock_becomes_available_stock(self):
+        response = self.client.post(self.url, {
+            'name': self.product.name,
+            'sku': self.product.sku,
+            'description': '',
+            'category': self.product.category,
+            'price': '45.00',
+            'stock': 20,
+            'low_stock_threshold': 10,
+        })
+
+        self.assertEqual(response.status_code, 302)
+        product = Product.objects.get(id=self.product.id)
+        self.assertEqual((product.stock, product.available_stock), (20, 20))
+        self.assertEqual(ProductSalesStats.objects.get(product=product).units_sold, 4)
+
+
+class SaleStockTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=5)
+
+    def test_sale_decrements_stock_in_database(self):
+        stale = Product.objects.get(id=self.product.id)
+        Product.objects.filter(id=self.product.id).update(stock=3)  # Another till's sale
+
+        sell(stale, 2)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+    def test_sale_beyond_stock_is_rejected(self):
+        with self.assertRaises(InsufficientStock):
+            sell(self.product, 6)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertFalse(Sale.objects.exists())
+
+
+class AvailableStockReadTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=12, low_stock_threshold=5)
+        fold(self.product.id, shards=3)
+        self.product.refresh_from_db()
+        sell(self.product, 12)  # Product.stock still reads 12 until the next fold
+
+    def test_properties_use_available_stock(self):
+        product = Product.objects.get(id=self.product.id)
+        self.assertEqual(product.stock, 12)
+        self.assertTrue(product.is_out_of_stock)
+        self.assertEqual(product.stock_status, 'out_of_stock')
+        self.assertEqual(product.total_value, 0)
+
+    def test_annotated_queryset(self):
+        product = Product.objects.with_available_stock().get(id=self.product.id)
+        self.assertEqual(product.live_stock, 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(product.available_stock, 0)
+
+    def test_dashboard_counts(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['out_of_stock_items'], 1)
+        self.assertEqual(response.context['low_stock_items'], 1)
+        self.assertEqual(response.context['inventory_value'], 0)
+
+    def test_products_export(self):
+        response = self.client.get(reverse('export_data'), {'type': 'products'})
+        row = response.content.decode().splitlines()[1].split(',')
+        self.assertEqual(row[4:], ['0', '5', 'out_of_stock'])
+
+
+@override_settings(SALE_INGEST_TOKENS=['till-token'])
+class SaleIngestTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=10)
+
+    def post(self, sales, content_type='application/json', token='till-token'):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        return self.client.post(
+            reverse('ingest_sales'), json.dumps({'sales': sales}), content_type=content_type, headers=headers
+        )
+
+    def line(self, key, quantity=1):
+        return {'key': key, 'sku': self.product.sku, 'quantity': quantity}
+
+    def test_requires_token(self):
+        self.assertEqual(self.post([self.line('a')], token=None).status_code, 401)
+        self.assertEqual(self.post([self.line('a')], token='wrong').status_code, 401)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_rejects_non_json_content_type(self):
+        response = self.post([self.line('a')], content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_replayed_batch_is_applied_once(self):
+        batch = [self.line('a', 2), self.line('b', 3)]
+        first = self.post(batch).json()
+        replay = self.post(batch).json()
+
+        self.assertEqual((first['created'], replay['duplicate']), (2, 2))
+        self.assertEqual(
+            [result['sale_id'] for result in first['results']],
+            [result['sale_id'] for result in replay['results']],
+        )
+        self.assertEqual(Sale.objects.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_duplicate_key_within_batch(self):
+        results = self.post([self.line('a', 2), self.line('a', 2)]).json()['results']
+
+        self.assertEqual([result['status'] for result in results], ['created', 'duplicate'])
+        self.assertEqual(results[0]['sale_id'], results[1]['sale_id'])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_key_committed_concurrently_is_reported_as_duplicate(self):
+        apply = ingest._apply
+        attempts = []
+
+        def racing_apply(lines):
+            attempts.append(lines)
+            if len(attempts) == 1:
+                apply(lines[:1])  # Another till commits the same key first
+                raise IntegrityError('UNIQUE constraint failed: inventory_saleingestkey.key')
+            return apply(lines)
+
+        with mock.patch.object(ingest, '_apply', racing_apply):
+            results = ingest.ingest_sales([self.line('a', 2), self.line('b', 1)])
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual([result['status'] for result in results], ['duplicate', 'created'])
+        self.assertEqual(SaleIngestKey.objects.count(), 2)
+        self.assertEqual(Sale.objects.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+
+
+class AnalyticsSnapshotTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=10)
+        sell(self.product, 1)
+        self.path = tempfile.TemporaryDirectory()
+        self.addCleanup(self.path.cleanup)
+        self.enterContext(override_settings(ANALYTICS_SNAPSHOT_DIR=self.path.name))
+        build_snapshot()
+
+    def test_append_picks_up_new_sales(self):
+        sell(self.product, 2)
+        self.assertEqual(append_snapshot(), 1)
+        self.assertEqual(SalesSnapshot().rows, 2)
+
+    def test_backdated_ingest_triggers_rebuild(self):
+        line = {
+            'key': 'offline-1',
+            'sku': self.product.sku,
+            'quantity': 1,
+            'sale_date': (timezone.now() - timedelta(days=3)).isoformat(),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest.ingest_sales([line])
+
+        append_snapshot()
+        snapshot = SalesSnapshot()
+        self.assertEqual(snapshot.rows, 2)
+        self.assertTrue((snapshot.columns['sale_date'][:-1] <= snapshot.columns['sale_date'][1:]).all())
+        self.assertEqual(append_snapshot(), 0)
+
+
+class AnalyticsRollupTests(TestCase):
+    def setUp(self):
+        products = [make_product(name=f'Product {i}', sku=f'P{i:03}', stock=100) for i in range(20)]
+        self.now = timezone.now()
+        # Three products sell in each of four months; the others never do
+        for month in range(4):
+            for product in products[month:month + 3]:
+                sale = sell(product, month + 1)
+                Sale.objects.filter(id=sale.id).update(sale_date=self.now - timedelta(days=30 * month + 1))
+        self.path = tempfile.TemporaryDirectory()
+        self.addCleanup(self.path.cleanup)
+        build_snapshot(self.path.name)
+        self.snapshot = SalesSnapshot(self.path.name)
+
+    def test_rollup_holds_only_products_that_sold(self):
+        _, _, offsets, products, revenue, quantity = self.snapshot._monthly_rollup()
+        self.assertEqual(len(products), len(set(
+            (month, product) for month in range(len(offsets) - 1) for product in products[offsets[month]:offsets[month + 1]]
+        )))
+        self.assertLessEqual(len(products), 12)
+        self.assertEqual(quantity.sum(), self.snapshot.columns['quantity'].sum())
+
+    def test_per_product_matches_full_scan(self):
+        for days in (None, 10, 45, 75, 200):
+            start = self.now - timedelta(days=days) if days else None
+            lo, hi = self.snapshot._range(start)
+            expected = self.snapshot._scan(lo, hi)
+            for actual, wanted in zip(self.snapshot._per_product(start), expected):
+                self.assertEqual(actual.tolist(), wanted.tolist(), days)
+
+
+class MonthlySalesReportTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=10)
+        self.now = timezone.make_aware(datetime(2026, 3, 15, 12, 0), dt_timezone.utc)
+
+    def monthly_sales(self):
+        with mock.patch('inventory.views.timezone.now', return_value=self.now):
+            response = self.client.get(reverse('reports'))
+        return {row['month']: row['total'] for row in response.context['monthly_sales']}
+
+    def summary(self, period, total):
+        SalesPeriodSummary.objects.create(
+            product=self.product, period=period, sale_count=1, total_quantity=1, total_sales=Decimal(total)
+        )
+
+    def test_live_sales_grouped_by_local_month(self):
+        # 23:30 UTC on 31 January is already 1 February in Johannesburg
+        sale = sell(self.product, 1)
+        Sale.objects.filter(id=sale.id).update(
+            sale_date=timezone.make_aware(datetime(2026, 1, 31, 23, 30), dt_timezone.utc)
+        )
+        self.summary(datetime(2026, 2, 1).date(), '10.00')
+
+        self.assertEqual(self.monthly_sales(), {'2026-02': Decimal('55.00')})
+
+    def test_same_cutoff_for_live_and_archived_sales(self):
+        self.summary(datetime(2025, 2, 1).date(), '10.00')  # Before the month a year ago
+        self.summary(datetime(2025, 3, 1).date(), '20.00')
+        sale = sell(self.product, 1)
+        Sale.objects.filter(id=sale.id).update(
+            sale_date=timezone.make_aware(datetime(2025, 3, 2, 12, 0), dt_timezone.utc)
+        )
+
+        self.assertEqual(self.monthly_sales(), {'2025-03': Decimal('65.00')})
+
+
+class StockAsOfTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.product = make_product(stock=10)
+        self.late_product = make_product(name='Biltong', sku='MEAT001', stock=7)
+        Product.objects.filter(id=self.product.id).update(created_at=self.at(10, 0))
+        Product.objects.filter(id=self.late_product.id).update(created_at=self.at(1, 6))
+
+        self.move(self.product, 5, self.at(5, 12))
+        self.move(self.product, -3, self.at(3, 12))
+        self.move(self.product, 2, self.at(1, 12))
+        self.move(self.late_product, 7, self.at(1, 6))
+        self.move(self.late_product, -2, self.at(0, 0))
+
+    def at(self, days_ago, hour):
+        return timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(hour)))
+
+    def move(self, product, quantity, when):
+        movement = StockMovement.objects.create(
+            product=product, movement_type='in' if quantity > 0 else 'out', quantity=quantity
+        )
+        StockMovement.objects.filter(id=movement.id).update(created_at=when)
+
+    def replayed(self, when):
+        """Stock at ``when`` from current stock and every movement since"""
+        stock = {}
+        for product in Product.objects.filter(created_at__lte=when):
+            later = StockMovement.objects.filter(product=product, created_at__gt=when)
+            stock[product.id] = product.stock - sum(later.values_list('quantity', flat=True))
+        return stock
+
+    def moments(self):
+        return [self.at(days_ago, hour) for days_ago in range(7, 0, -1) for hour in range(0, 24, 5)]
+
+    def assert_matches_replay(self):
+        for when in self.moments():
+            self.assertEqual(stock_as_of(when), self.replayed(when), when)
+
+    def test_take_snapshots(self):
+        written = take_snapshots([self.today - timedelta(days=4), self.today - timedelta(days=2), self.today])
+
+        self.assertEqual(written, 2)  # Today has not ended, Biltong did not exist yet
+        self.assertEqual(
+            dict(StockSnapshot.objects.values_list('date', 'stock')),
+            {self.today - timedelta(days=4): 11, self.today - timedelta(days=2): 8},
+        )
+
+    def test_nearest_snapshot_before_or_after(self):
+        take_snapshots([self.today - timedelta(days=4), self.today - timedelta(days=2)])
+        # Early on day -3 the snapshot ending day -4 is nearest, late on day -3 the one ending day -2
+        self.assertEqual(stock_as_of(self.at(3, 6))[self.product.id], 11)
+        self.assertEqual(stock_as_of(self.at(3, 18))[self.product.id], 8)
+        self.assert_matches_replay()
+
+    def test_without_snapshots(self):
+        self.assert_matches_replay()
+
+    def test_uncovered_products_with_and_without_id_filter(self):
+        take_snapshots([self.today - timedelta(days=2)])
+        self.assertFalse(StockSnapshot.objects.filter(product=self.late_product).exists())
+
+        self.assert_matches_replay()
+        with mock.patch.object(snapshots, 'MISSING_LOOKUP_LIMIT', 0):
+            self.assert_matches_replay()
+
+    def test_archived_movements(self):
+        expected = {when: self.replayed(when) for when in self.moments()}
+        take_snapshots([self.today - timedelta(days=4)])
+        archive_stock_movements(self.at(0, 0) + timedelta(seconds=1))
+        self.assertFalse(StockMovement.objects.exists())
+
+        for when, stock in expected.items():
+            self.assertEqual(stock_as_of(when), stock, when)
+
+    def test_export(self):
+        day = self.today - timedelta(days=3)
+        response = self.client.get(reverse('export_data'), {'type': 'stock_as_of', 'date': day.isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.content.decode().splitlines()
+        self.assertEqual(rows[1:], ['Rooibos Tea,TEA001,Food & Beverages,8'])
+
+    def test_export_rejects_bad_dates(self):
+        for params in ({}, {'date': '2026-02-30'}, {'date': 'yesterday'}, {'at': '2026-01-01T25:00'}, {'at': 'noon'}):
+            response = self.client.get(reverse('export_data'), {'type': 'stock_as_of', **params})
+            self.assertEqual(response.status_code, 400, params)
+
+
+class AbcClassificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.top = make_product(name='Top', sku='A001', price=Decimal('80.00'))
+        self.middle = make_product(name='Middle', sku='B001', price=Decimal('15.00'))
+        self.bottom = make_product(name='Bottom', sku='C001', price=Decimal('5.00'), stock=100)
+        self.unsold = make_product(name='Unsold', sku='D001', price=Decimal('1.00'))
+        for product in (self.top, self.middle, self.bottom):
+            sell(product, 1)
+
+    def classes(self, report):
+        return {row['product'].sku: row['abc_class'] for row in report.rows()}
+
+    def test_class_boundaries(self):
+        # 80% of revenue before the middle product and 95% before the bottom one
+        report = build_report('30')
+        self.assertEqual(self.classes(report), {'A001': 'A', 'B001': 'B', 'C001': 'C', 'D001': 'C'})
+        self.assertEqual(
+            [(row['products'], row['revenue']) for row in report.summary()],
+            [(1, 80.0), (1, 15.0), (2, 5.0)],
+        )
+
+    def test_products_without_sales(self):
+        row = build_report('30')[3:4][0]
+        self.assertEqual(
+            (row['product'], row['units_sold'], row['revenue'], row['turnover']),
+            (self.unsold, 0, 0.0, 0.0),
+        )
+
+        Sale.objects.all().delete()
+        report = build_report('30')
+        self.assertEqual(set(self.classes(report).values()), {'C'})
+        self.assertEqual(report.share.tolist(), [0.0] * 4)
+
+    def test_sharded_stock_is_net_of_unfolded_sales(self):
+        fold(self.top.id, shards=2)
+        sell(self.top, 3)
+
+        row = build_report('30')[0:1][0]
+        self.assertEqual((row['stock'], row['units_sold'], row['stock_value']), (6, 4, 480.0))
+
+    def test_positions(self):
+        ids = _id_array([_as_id_text(product.id) for product in (self.top, self.middle, self.bottom)])
+        order = ids.argsort()
+        wanted = _id_array([_as_id_text(self.bottom.id), _as_id_text(self.unsold.id), _as_id_text(self.top.id)])
+
+        positions, found = _positions(ids, order, wanted)
+
+        self.assertEqual(found.tolist(), [True, False, True])
+        self.assertEqual(positions.tolist(), [2, 0])
+        self.assertEqual(_positions(ids[:0], order[:0], wanted)[1].tolist(), [False] * 3)
+
+    def test_all_time_and_dated_periods(self):
+        # A sale from two months ago counts towards 90 days and all time, but not 30 days
+        sale = sell(self.bottom, 20)
+        Sale.objects.filter(id=sale.id).update(sale_date=timezone.now() - timedelta(days=60))
+
+        self.assertEqual(self.classes(build_report('30'))['C001'], 'C')
+        for period in ('90', 'all'):
+            report = build_report(period)
+            self.assertEqual(self.classes(report)['C001'], 'A', period)
+            self.assertEqual(report.units[0], 21, period)
+
+    def test_pagination(self):
+        Product.objects.bulk_create([
+            Product(name=f'Filler {i:02}', sku=f'F{i:03}', category='home_living', price=Decimal('1.00'))
+            for i in range(60)
+        ])
+        report = build_report('30')
+        self.assertEqual(len(report), 64)
+        self.assertEqual([row['rank'] for row in report[50:70]], list(range(51, 65)))
+
+        response = self.client.get(reverse('abc_classification'), {'page': 2, 'period': '30'})
+        page = list(response.context['page_obj'])
+        self.assertEqual((len(page), page[0]['rank']), (14, 51))
+
+    def test_streamed_csv(self):
+        response = self.client.get(reverse('export_data'), {'type': 'abc', 'period': '30'})
+
+        self.assertTrue(response.streaming)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1].split(',')[:7], ['1', 'A', 'Top', 'A001', 'Food & Beverages', '1', 'R80.00'])
+        self.assertEqual(
+            self.client.get(reverse('export_data'), {'type': 'abc', 'period': '7'}).status_code, 400
+        )
+
+
+class SalesStatsTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=100)
+        self.when = timezone.make_aware(datetime(2026, 3, 15, 12, 0), dt_timezone.utc)
+
+    def totals(self):
+        return {
+            stats.product_id: (stats.units_sold, stats.revenue, stats.sale_count, stats.last_sale_at)
+            for stats in ProductSalesStats.objects.all()
+        }
+
+    def test_record_sales_increments_in_database(self):
+        record_sales(self.product.id, 2, Decimal('90.00'), 1, self.when)
+        # A concurrent writer's change is added to, not overwritten
+        ProductSalesStats.objects.filter(product=self.product).update(units_sold=10)
+
+        with CaptureQueriesContext(connection) as queries:
+            record_sales(self.product.id, 3, 135, 2, self.when)
+
+        self.assertIn('"units_sold" + ', queries[0]['sql'])
+        self.assertEqual(self.totals()[self.product.id], (13, Decimal('225.00'), 3, self.when))
+
+    def test_last_sale_at_never_moves_backwards(self):
+        record_sales(self.product.id, 1, 45, 1, self.when)
+        record_sales(self.product.id, 1, 45, 1, self.when - timedelta(days=30))
+        self.assertEqual(self.totals()[self.product.id][3], self.when)
+
+        record_sales(self.product.id, 1, 45, 1, self.when + timedelta(days=1))
+        self.assertEqual(self.totals()[self.product.id][3], self.when + timedelta(days=1))
+
+    def test_rebuild_after_archiving(self):
+        other = make_product(name='Biltong', sku='MEAT001', price=Decimal('120.00'))
+        for product, quantity, days_ago in ((self.product, 2, 400), (self.product, 3, 10), (other, 1, 500)):
+            sale = sell(product, quantity)
+            Sale.objects.filter(id=sale.id).update(sale_date=timezone.now() - timedelta(days=days_ago))
+        expected = self.totals()
+        expected[self.product.id] = expected[self.product.id][:3] + (
+            Sale.objects.filter(product=self.product).latest('sale_date').sale_date,
+        )
+        expected[other.id] = expected[other.id][:3] + (Sale.objects.get(product=other).sale_date,)
+
+        self.assertEqual(archive_sales(timezone.now() - timedelta(days=365)), 2)
+        self.assertEqual(rebuild(), 2)
+
+        self.assertEqual(self.totals(), expected)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        search.invalidate()
+        self.addCleanup(search.invalidate)
+        self.tea = make_product(name='Rooibos Tea', sku='TEA001', stock=10)
+        self.rusks = make_product(name='Rusks', sku='RUS001', stock=4)
+        self.twine = make_product(name='Twine', sku='RT-77', category='arts_crafts', stock=3)
+
+    def names(self, query):
+        return [result['name'] for result in search.suggest(query)]
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.names('  rUs '), ['Rusks'])
+        self.assertEqual(self.names('tea'), ['Rooibos Tea'])  # By SKU; names only match from the start
+        self.assertEqual(self.names('bos'), [])
+        self.assertEqual(self.names(''), [])
+
+    def test_names_before_skus(self):
+        self.assertEqual(self.names('r'), ['Rooibos Tea', 'Rusks', 'Twine'])
+        with self.settings(TYPEAHEAD_RESULTS=2):
+            search.invalidate()
+            self.assertEqual(self.names('r'), ['Rooibos Tea', 'Rusks'])
+
+    def test_cache_hit_reads_only_stock(self):
+        self.names('ru')
+        with CaptureQueriesContext(connection) as queries:
+            self.names('ru')
+        self.assertEqual(len(queries), 1)
+        self.assertIn('live_stock', queries[0]['sql'].lower().replace('"', ''))
+
+    def test_lru_eviction_and_ttl(self):
+        with self.settings(TYPEAHEAD_CACHE_SIZE=2):
+            for query in ('ru', 'ro', 'ru', 'tw'):
+                self.names(query)
+            self.assertEqual(list(search._cache), ['ru', 'tw'])  # 'ro' was least recently used
+
+        with self.settings(TYPEAHEAD_CACHE_TTL=0):
+            search.invalidate()
+            self.names('tw')
+            Product.objects.filter(id=self.twine.id).update(name='Twist Ties')  # No signal
+            self.assertEqual(self.names('tw'), ['Twist Ties'])
+
+    def test_stock_is_current_without_invalidation(self):
+        self.assertEqual(search.suggest('ru')[0]['stock'], 4)
+        sell(self.rusks, 3)
+        self.assertIn('ru', search._cache)
+        self.assertEqual(search.suggest('ru')[0]['stock'], 1)
+
+    def test_saving_a_product_drops_only_its_prefixes(self):
+        for query in ('ro', 'ru', 'tw', 'te'):
+            self.names(query)
+
+        self.tea.name = 'Honeybush Tea'
+        self.tea.save()
+        self.assertEqual(sorted(search._cache), ['ru', 'tw'])
+        self.assertEqual(self.names('ro'), [])
+
+        make_product(name='Runner Beans', sku='BEAN01', category='garden_plants')
+        self.assertEqual(sorted(search._cache), ['ro', 'tw'])
+        self.assertEqual(self.names('ru'), ['Runner Beans', 'Rusks'])
+
+        self.rusks.stock = 50
+        self.rusks.save(update_fields=['stock'])
+        self.assertIn('ru', search._cache)
+
+        self.twine.delete()
+        self.assertNotIn('tw', search._cache)
+
+
+class ArchivedSalesReportTests(TestCase):
+    def setUp(self):
+        self.tea = make_product(stock=100)
+        self.biltong = make_product(name='Biltong', sku='MEAT001', price=Decimal('120.00'), stock=100)
+        for product, quantity, days_ago in (
+            (self.tea, 2, 400), (self.tea, 3, 100), (self.biltong, 1, 20), (self.biltong, 2, 1), (self.tea, 1, 0),
+        ):
+            sale = sell(product, quantity)
+            Sale.objects.filter(id=sale.id).update(sale_date=timezone.now() - timedelta(days=days_ago))
+
+    def figures(self):
+        reports = self.client.get(reverse('reports')).context
+        totals = {}
+        for date_filter in ('', 'month'):
+            context = self.client.get(reverse('sales_list'), {'date_filter': date_filter}).context
+            totals[date_filter] = (context['total_sales'], context['total_quantity'])
+        return {
+            'sales_by_category': reports['sales_by_category'],
+            'top_products': list(reports['top_products']),
+            'monthly_sales': reports['monthly_sales'],
+            'sales_list': totals,
+            'export': self.client.get(reverse('export_data'), {'type': 'sales'}).content,
+        }
+
+    def test_archiving_leaves_reports_and_export_unchanged(self):
+        before = self.figures()
+        self.assertEqual(before['sales_list'][''], (Decimal('630.00'), 9))
+
+        self.assertEqual(archive_sales(timezone.now() - timedelta(days=5)), 3)
+
+        self.assertEqual(self.figures(), before)
+        response = self.client.get(reverse('sales_list'))
+        self.assertEqual(response.context['archived_quantity'], 6)
+        self.assertContains(response, 'Includes 6 archived units')
+
+
+class TimeOrderedIdTests(TestCase):
+    when = datetime(2026, 3, 15, 12, 0, 0, 123000, tzinfo=dt_timezone.utc)
+
+    def test_version_variant_and_timestamp(self):
+        for value in (uuid7(), uuid7(self.when), uuid7(self.when, entropy=(1 << 80) - 1), uuid7(self.when, entropy=0)):
+            self.assertEqual(value.version, 7)
+            self.assertEqual(value.variant, uuid.RFC_4122)
+        self.assertEqual(uuid7(self.when).int >> 80, int(self.when.timestamp() * 1000))
+
+    def test_keys_sort_by_time(self):
+        keys = [uuid7(self.when + timedelta(milliseconds=offset)) for offset in (0, 1, 2, 1000, 86_400_000)]
+        self.assertEqual(sorted(keys), keys)
+        self.assertEqual(sorted(str(key) for key in keys), [str(key) for key in keys])
+
+    def test_rekey_is_deterministic(self):
+        old = uuid.uuid4()
+        new = rekey(old, self.when)
+
+        self.assertEqual(rekey(old, self.when), new)
+        self.assertNotEqual(rekey(uuid.uuid4(), self.when), new)
+        self.assertTrue(is_time_ordered(new))
+        self.assertFalse(is_time_ordered(old))
+        self.assertEqual(new.int >> 80, int(self.when.timestamp() * 1000))
+
+
+class ReissueIdsTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=100)
+        self.sales = []
+        for days_ago in (3, 2, 1):
+            sale = Sale.objects.create(id=uuid.uuid4(), product=self.product, quantity=1, unit_price=self.product.price)
+            Sale.objects.filter(id=sale.id).update(sale_date=timezone.now() - timedelta(days=days_ago))
+            sale.refresh_from_db()
+            self.sales.append(sale)
+            StockMovement.objects.create(
+                id=uuid.uuid4(), product=self.product, movement_type='sale', quantity=-1, reason=f'Sale #{sale.id}'
+            )
+        self.archived = ArchivedStockMovement.objects.create(
+            id=uuid.uuid4(), product=self.product, movement_type='sale', quantity=-1,
+            reason=f'Sale #{self.sales[0].id}', created_at=timezone.now() - timedelta(days=3),
+        )
+        StockMovement.objects.create(product=self.product, movement_type='adjustment', quantity=5, reason='Sale #count')
+
+    def reissue(self):
+        out = StringIO()
+        call_command('reissue_ids', batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_reissue_rekeys_and_relinks(self):
+        self.assertIn('Re-keyed 3 sales and 3 stock movements, updated 4 sale references', self.reissue())
+
+        new_ids = [rekey(sale.id, sale.sale_date) for sale in self.sales]
+        self.assertEqual(list(Sale.objects.order_by('sale_date').values_list('id', flat=True)), new_ids)
+        self.assertEqual(list(Sale.objects.order_by('id').values_list('id', flat=True)), new_ids)
+        self.assertTrue(all(is_time_ordered(pk) for pk in StockMovement.objects.values_list('id', flat=True)))
+        self.assertEqual(
+            set(StockMovement.objects.filter(movement_type='sale').values_list('reason', flat=True)),
+            {f'Sale #{sale_id}' for sale_id in new_ids},
+        )
+        self.archived.refresh_from_db()
+        self.assertEqual(self.archived.reason, f'Sale #{new_ids[0]}')
+        self.assertTrue(StockMovement.objects.filter(reason='Sale #count').exists())
+
+    def test_rerun_changes_nothing(self):
+        self.reissue()
+        keys = set(Sale.objects.values_list('id', flat=True))
+        self.assertIn('Re-keyed 0 sales and 0 stock movements, updated 0 sale references', self.reissue())
+        self.assertEqual(set(Sale.objects.values_list('id', flat=True)), keys)
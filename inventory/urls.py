@@ -4,9 +4,12 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('products/', views.product_list, name='product_list'),
+    path('products/suggest/', views.product_suggestions, name='product_suggestions'),
     path('products/<uuid:product_id>/', views.product_detail, name='product_detail'),
     path('sales/', views.sales_list, name='sales_list'),
     path('sales/record/', views.record_sale, name='record_sale'),
+    path('sales/ingest/', views.ingest_sales_batch, name='ingest_sales'),
     path('reports/', views.reports, name='reports'),
+    path('reports/abc/', views.abc_classification, name='abc_classification'),
     path('export/', views.export_data, name='export_data'),
 ]
\ No newline at end of file
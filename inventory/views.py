@@ -1,20 +1,32 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.db.models import Sum, Count, Q, F
-from django.http import JsonResponse, HttpResponse
+from django.db.models.functions import TruncMonth
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from decimal import Decimal
 import csv
+import json
 from datetime import datetime, timedelta
-from .models import Product, Sale, StockMovement
+from .models import Product, Sale, StockMovement, ArchivedSale, SalesPeriodSummary, ProductSalesStats
+from .archive import merge_totals, period_start
+from .classification import DEFAULT_PERIOD, PERIODS, get_report
+from .counters import unfolded_stats
+from .ingest import BatchError, ingest_sales, is_authorized
+from .search import suggest
+from .snapshots import end_of_day, stock_as_of
 
 def dashboard(request):
     """Main dashboard view with metrics and overview"""
     # Calculate metrics
     total_products = Product.objects.count()
-    low_stock_items = Product.objects.filter(stock__lte=F('low_stock_threshold')).count()
-    out_of_stock_items = Product.objects.filter(stock=0).count()
+    products = Product.objects.with_available_stock()
+    low_stock_items = products.filter(live_stock__lte=F('low_stock_threshold')).count()
+    out_of_stock_items = products.filter(live_stock=0).count()
     
     # Sales metrics
     sales_today = Sale.objects.filter(sale_date__date=datetime.now().date())
@@ -24,12 +36,12 @@ def dashboard(request):
     recent_sales = Sale.objects.select_related('product').order_by('-sale_date')[:5]
     
     # Low stock products
-    low_stock_products = Product.objects.filter(
-        stock__lte=F('low_stock_threshold')
-    ).order_by('stock')[:10]
+    low_stock_products = products.filter(
+        live_stock__lte=F('low_stock_threshold')
+    ).order_by('live_stock')[:10]
     
     # Total inventory value
-    inventory_value = sum(product.total_value for product in Product.objects.all())
+    inventory_value = sum(product.total_value for product in products)
     
     context = {
         'total_products': total_products,
@@ -47,7 +59,7 @@ def product_list(request):
     search_query = request.GET.get('search', '')
     category_filter = request.GET.get('category', '')
     
-    products = Product.objects.all()
+    products = Product.objects.with_available_stock()
     
     if search_query:
         products = products.filter(
@@ -74,14 +86,30 @@ def product_list(request):
     }
     return render(request, 'inventory/product_list.html', context)
 
+def product_suggestions(request):
+    """Typeahead suggestions (name, SKU, stock) for the product search box"""
+    return JsonResponse({'results': suggest(request.GET.get('q', ''))})
+
 def product_detail(request, product_id):
     """Product detail view"""
-    product = get_object_or_404(Product, id=product_id)
+    product = get_object_or_404(Product.objects.with_available_stock(), id=product_id)
     recent_sales = product.sales.order_by('-sale_date')[:10]
     stock_movements = product.stock_movements.order_by('-created_at')[:10]
     
+    sales_stats = ProductSalesStats.objects.filter(product=product).first() or ProductSalesStats(product=product)
+    if product.stock_shards:
+        # Add the sales still held in the counter slots
+        units, revenue, count, last_sale_at = unfolded_stats(product)
+        sales_stats.units_sold += units
+        sales_stats.revenue += revenue
+        sales_stats.sale_count += count
+        if last_sale_at and (sales_stats.last_sale_at is None or last_sale_at > sales_stats.last_sale_at):
+            sales_stats.last_sale_at = last_sale_at
+    
     context = {
         'product': product,
+        'available_stock': product.available_stock,
+        'sales_stats': sales_stats,
         'recent_sales': recent_sales,
         'stock_movements': stock_movements,
     }
@@ -93,28 +121,35 @@ def sales_list(request):
     
     # Date filtering
     date_filter = request.GET.get('date_filter', '')
+    filters = {}
     if date_filter == 'today':
-        sales = sales.filter(sale_date__date=datetime.now().date())
+        filters = {'sale_date__date': datetime.now().date()}
     elif date_filter == 'week':
-        week_ago = datetime.now() - timedelta(days=7)
-        sales = sales.filter(sale_date__gte=week_ago)
+        filters = {'sale_date__gte': datetime.now() - timedelta(days=7)}
     elif date_filter == 'month':
-        month_ago = datetime.now() - timedelta(days=30)
-        sales = sales.filter(sale_date__gte=month_ago)
+        filters = {'sale_date__gte': datetime.now() - timedelta(days=30)}
+    sales = sales.filter(**filters)
     
     # Pagination
     paginator = Paginator(sales, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Calculate totals
-    total_sales = sales.aggregate(total=Sum('total_price'))['total'] or Decimal('0')
-    total_quantity = sales.aggregate(total=Sum('quantity'))['total'] or 0
+    # Calculate totals, archived sales included: from the monthly summaries for
+    # all time, from the archived rows themselves for a date range
+    totals = sales.aggregate(total=Sum('total_price'), quantity=Sum('quantity'))
+    if filters:
+        archived = ArchivedSale.objects.filter(**filters).aggregate(total=Sum('total_price'), quantity=Sum('quantity'))
+    else:
+        archived = SalesPeriodSummary.objects.aggregate(total=Sum('total_sales'), quantity=Sum('total_quantity'))
+    total_sales = (totals['total'] or Decimal('0')) + (archived['total'] or Decimal('0'))
+    total_quantity = (totals['quantity'] or 0) + (archived['quantity'] or 0)
     
     context = {
         'page_obj': page_obj,
         'total_sales': total_sales,
         'total_quantity': total_quantity,
+        'archived_quantity': archived['quantity'] or 0,
         'date_filter': date_filter,
     }
     return render(request, 'inventory/sales_list.html', context)
@@ -128,8 +163,9 @@ def record_sale(request):
         
         product = get_object_or_404(Product, id=product_id)
         
-        if product.stock < quantity:
-            messages.error(request, f"Insufficient stock. Only {product.stock} units available.")
+        available_stock = product.available_stock
+        if available_stock < quantity:
+            messages.error(request, f"Insufficient stock. Only {available_stock} units available.")
             return redirect('product_detail', product_id=product_id)
         
         # Create sale
@@ -154,32 +190,76 @@ def record_sale(request):
         messages.error(request, f"Error recording sale: {str(e)}")
         return redirect('product_list')
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def ingest_sales_batch(request):
+    """Idempotent batch sale submission for POS tills (JSON in, per-line JSON results out)"""
+    if not is_authorized(request.headers.get('Authorization')):
+        return JsonResponse({'error': 'A valid till token is required'}, status=401)
+    # Only JSON, which browsers cannot send cross-site without a CORS preflight
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Content-Type must be application/json'}, status=415)
+    
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Request body must be JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+    
+    try:
+        results = ingest_sales(payload.get('sales'))
+    except BatchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    summary = {status: 0 for status in ('created', 'duplicate', 'error')}
+    for result in results:
+        summary[result['status']] += 1
+    return JsonResponse({'results': results, **summary})
+
 def reports(request):
     """Reports and analytics page"""
-    # Sales by category
-    sales_by_category = Sale.objects.select_related('product').values(
-        'product__category'
-    ).annotate(
-        total_sales=Sum('total_price'),
-        total_quantity=Sum('quantity')
-    ).order_by('-total_sales')
+    # Sales by category (live sales plus archived monthly summaries)
+    sales_by_category = merge_totals(
+        ['product__category'],
+        Sale.objects.values('product__category').annotate(
+            total_sales=Sum('total_price'),
+            total_quantity=Sum('quantity')
+        ),
+        SalesPeriodSummary.objects.values('product__category').annotate(
+            total_sales=Sum('total_sales'),
+            total_quantity=Sum('total_quantity')
+        ),
+    )
+    
+    # Top selling products (lifetime totals kept on write)
+    top_products = ProductSalesStats.objects.filter(sale_count__gt=0).order_by('-revenue').values(
+        'product__name', 'product__sku',
+        total_sales=F('revenue'),
+        total_quantity=F('units_sold')
+    )[:10]
     
-    # Top selling products
-    top_products = Sale.objects.select_related('product').values(
-        'product__name', 'product__sku'
+    # Monthly sales, by local calendar month like the archived summaries, from
+    # the start of the month a year ago so both sources share one cutoff
+    first_month = period_start(timezone.now() - timedelta(days=365))
+    monthly_totals = {}
+    for row in Sale.objects.filter(
+        sale_date__gte=timezone.make_aware(datetime.combine(first_month, datetime.min.time()))
     ).annotate(
-        total_sales=Sum('total_price'),
-        total_quantity=Sum('quantity')
-    ).order_by('-total_sales')[:10]
-    
-    # Monthly sales
-    monthly_sales = Sale.objects.filter(
-        sale_date__gte=datetime.now() - timedelta(days=365)
-    ).extra(
-        select={'month': "strftime('%%Y-%%m', sale_date)"}
+        month=TruncMonth('sale_date')
     ).values('month').annotate(
         total=Sum('total_price')
-    ).order_by('month')
+    ):
+        month = row['month'].strftime('%Y-%m')
+        monthly_totals[month] = monthly_totals.get(month, 0) + row['total']
+    for row in SalesPeriodSummary.objects.filter(
+        period__gte=first_month
+    ).values('period').annotate(total=Sum('total_sales')):
+        month = row['period'].strftime('%Y-%m')
+        monthly_totals[month] = monthly_totals.get(month, 0) + row['total']
+    monthly_sales = [
+        {'month': month, 'total': total} for month, total in sorted(monthly_totals.items())
+    ]
     
     context = {
         'sales_by_category': sales_by_category,
@@ -188,10 +268,33 @@ def reports(request):
     }
     return render(request, 'inventory/reports.html', context)
 
+def abc_classification(request):
+    """ABC (Pareto) classification of every product by revenue over a period"""
+    period = request.GET.get('period', DEFAULT_PERIOD)
+    if period not in PERIODS:
+        period = DEFAULT_PERIOD
+    report = get_report(period)
+    
+    paginator = Paginator(report, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'page_obj': page_obj,
+        'class_summary': report.summary(),
+        'generated_at': report.generated_at,
+        'period': period,
+    }
+    return render(request, 'inventory/abc_classification.html', context)
+
 def export_data(request):
     """Export data to CSV"""
     export_type = request.GET.get('type', 'products')
     
+    if export_type == 'stock_as_of':
+        return export_stock_as_of(request)
+    if export_type == 'abc':
+        return export_abc_classification(request)
+    
     response = HttpResponse(content_type='text/csv')
     
     if export_type == 'products':
@@ -199,13 +302,13 @@ def export_data(request):
         writer = csv.writer(response)
         writer.writerow(['Name', 'SKU', 'Category', 'Price (ZAR)', 'Stock', 'Low Stock Threshold', 'Stock Status'])
         
-        for product in Product.objects.all():
+        for product in Product.objects.with_available_stock():
             writer.writerow([
                 product.name,
                 product.sku,
                 product.get_category_display(),
                 f"R{product.price}",
-                product.stock,
+                product.available_stock,
                 product.low_stock_threshold,
                 product.stock_status
             ])
@@ -215,14 +318,89 @@ def export_data(request):
         writer = csv.writer(response)
         writer.writerow(['Date', 'Product', 'SKU', 'Quantity', 'Unit Price (ZAR)', 'Total (ZAR)'])
         
-        for sale in Sale.objects.select_related('product').order_by('-sale_date'):
-            writer.writerow([
-                sale.sale_date.strftime('%Y-%m-%d %H:%M'),
-                sale.product.name,
-                sale.product.sku,
-                sale.quantity,
-                f"R{sale.unit_price}",
-                f"R{sale.total_price}"
+        # Archived sales are all older than live ones, so they follow in date order
+        for queryset in (Sale.objects, ArchivedSale.objects):
+            for sale in queryset.select_related('product').order_by('-sale_date'):
+                writer.writerow([
+                    sale.sale_date.strftime('%Y-%m-%d %H:%M'),
+                    sale.product.name,
+                    sale.product.sku,
+                    sale.quantity,
+                    f"R{sale.unit_price}",
+                    f"R{sale.total_price}"
+                ])
+    
+    return response
+
+
+def export_stock_as_of(request):
+    """Export every product's stock level at a past date (end of day) or moment"""
+    when = None
+    try:
+        if request.GET.get('at'):
+            when = parse_datetime(request.GET['at'])
+            if when is not None and timezone.is_naive(when):
+                when = timezone.make_aware(when)
+        elif request.GET.get('date'):
+            day = parse_date(request.GET['date'])
+            when = end_of_day(day) - timedelta(microseconds=1) if day else None
+    except ValueError:
+        when = None
+    if when is None:
+        return HttpResponse('Pass ?date=YYYY-MM-DD or ?at=<ISO 8601 datetime>', status=400)
+    
+    stock = stock_as_of(when)
+    
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="stock_{timezone.localtime(when):%Y%m%d_%H%M}.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['Name', 'SKU', 'Category', f'Stock at {timezone.localtime(when):%Y-%m-%d %H:%M}'])
+    for product in Product.objects.filter(id__in=stock.keys()).only('id', 'name', 'sku', 'category'):
+        writer.writerow([
+            product.name,
+            product.sku,
+            product.get_category_display(),
+            stock[product.id],
+        ])
+    return response
+
+
+class Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+    
+    def write(self, value):
+        return value
+
+
+def export_abc_classification(request):
+    """Stream the ABC classification of every product as CSV"""
+    period = request.GET.get('period', DEFAULT_PERIOD)
+    if period not in PERIODS:
+        return HttpResponse(f"Unknown period. Choose one of: {', '.join(PERIODS)}", status=400)
+    report = get_report(period)
+    writer = csv.writer(Echo())
+    
+    def rows():
+        yield writer.writerow([
+            'Rank', 'Class', 'Name', 'SKU', 'Category', 'Units Sold', 'Revenue (ZAR)',
+            'Revenue Share (%)', 'Cumulative Share (%)', 'Stock', 'Stock Value (ZAR)', 'Turnover',
+        ])
+        for row in report.rows():
+            yield writer.writerow([
+                row['rank'],
+                row['abc_class'],
+                row['product'].name,
+                row['product'].sku,
+                row['product'].get_category_display(),
+                row['units_sold'],
+                f"R{row['revenue']:.2f}",
+                f"{row['revenue_share'] * 100:.4f}",
+                f"{row['cumulative_share'] * 100:.2f}",
+                row['stock'],
+                f"R{row['stock_value']:.2f}",
+                '' if row['turnover'] is None else f"{row['turnover']:.2f}",
             ])
     
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="abc_classification_{period}.csv"'
     return response
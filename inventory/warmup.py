@@ -0,0 +1,95 @@
+"""
+Process warm-up.
+
+``warm_up`` pays the costs that otherwise land on the first requests a fresh
+worker serves: compiling templates, building the URL resolver, rendering the
+main pages once (which also prepares their ORM queries), pulling the hot
+indexes into the database cache and building the analytics rollup. It is run
+by the ``warmup`` command and, with WARMUP_ON_STARTUP, by the WSGI/ASGI entry
+points.
+"""
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import get_resolver, reverse
+
+from .analytics import default_path, get_snapshot
+from .models import Product, ProductSalesStats, Sale, StockMovement
+from .search import lookup
+
+# Pages rendered during warm-up; all take no URL arguments
+WARMUP_PAGES = ['dashboard', 'product_list', 'sales_list', 'reports']
+
+
+def template_names():
+    """Every template in the project and inventory app template directories"""
+    names = []
+    roots = [Path(directory) for directory in settings.TEMPLATES[0]['DIRS']]
+    roots.append(Path(__file__).resolve().parent / 'templates')
+    for root in roots:
+        if root.is_dir():
+            names += [str(path.relative_to(root)) for path in sorted(root.rglob('*.html'))]
+    return names
+
+
+def warm_templates():
+    for name in template_names():
+        get_template(name)
+
+
+def warm_urls():
+    resolver = get_resolver()
+    resolver.url_patterns
+    for name in WARMUP_PAGES:
+        reverse(name)
+
+
+def warm_pages():
+    factory = RequestFactory()
+    for name in WARMUP_PAGES:
+        match = get_resolver().resolve(reverse(name))
+        response = match.func(factory.get(reverse(name)), *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+
+
+def warm_indexes():
+    """Run small queries that walk the indexes the main pages depend on"""
+    Product.objects.filter(stock__lte=F('low_stock_threshold')).count()
+    list(Sale.objects.order_by('-sale_date').values_list('id', flat=True)[:20])
+    list(StockMovement.objects.order_by('-created_at').values_list('id', flat=True)[:20])
+    list(ProductSalesStats.objects.order_by('-revenue').values_list('product_id', flat=True)[:10])
+    lookup('a', 1)
+
+
+def warm_analytics():
+    if (default_path() / 'meta.json').exists():
+        get_snapshot().top_products()
+
+
+WARMUP_STEPS = [
+    ('templates', warm_templates),
+    ('url resolver', warm_urls),
+    ('pages', warm_pages),
+    ('indexes', warm_indexes),
+    ('analytics snapshot', warm_analytics),
+]
+
+
+def warm_up():
+    """Run every warm-up step, returning ``(step, milliseconds)`` pairs"""
+    timings = []
+    try:
+        for name, step in WARMUP_STEPS:
+            started = time.perf_counter()
+            step()
+            timings.append((name, (time.perf_counter() - started) * 1000))
+    finally:
+        # Never hand an open connection to processes forked after a preload
+        connections.close_all()
+    return timings
@@ -58,25 +58,80 @@ document.addEventListener('DOMContentLoaded', function() {
         input.addEventListener('input', calculateTotal);
     });
 
-    // Search functionality
+    // Typeahead product search (suggestions come from the server)
     const searchInput = document.querySelector('#searchInput');
-    if (searchInput) {
+    const suggestionList = document.querySelector('#searchSuggestions');
+    if (searchInput && suggestionList && searchInput.dataset.suggestUrl) {
         let searchTimeout;
+        let pendingRequest;
+
+        function hideSuggestions() {
+            suggestionList.classList.add('d-none');
+            suggestionList.innerHTML = '';
+        }
+
+        function showSuggestions(results) {
+            suggestionList.innerHTML = '';
+            if (!results.length) {
+                hideSuggestions();
+                return;
+            }
+            results.forEach(product => {
+                const item = document.createElement('a');
+                item.href = product.url;
+                item.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+
+                const label = document.createElement('span');
+                label.textContent = product.name;
+                const sku = document.createElement('small');
+                sku.className = 'text-muted ms-2';
+                sku.textContent = product.sku;
+                label.appendChild(sku);
+
+                const stock = document.createElement('span');
+                stock.className = 'badge ' + (product.stock > 0 ? 'bg-success' : 'bg-danger');
+                stock.textContent = product.stock + ' units';
+
+                item.append(label, stock);
+                suggestionList.appendChild(item);
+            });
+            suggestionList.classList.remove('d-none');
+        }
+
         searchInput.addEventListener('input', function() {
             clearTimeout(searchTimeout);
+            const query = this.value.trim();
+            if (!query) {
+                hideSuggestions();
+                return;
+            }
             searchTimeout = setTimeout(() => {
-                const searchTerm = this.value.toLowerCase();
-                const tableRows = document.querySelectorAll('tbody tr');
-                
-                tableRows.forEach(row => {
-                    const text = row.textContent.toLowerCase();
-                    if (text.includes(searchTerm)) {
-                        row.style.display = '';
-                    } else {
-                        row.style.display = 'none';
-                    }
-                });
-            }, 300);
+                // Only the latest keystroke's request matters
+                if (pendingRequest) {
+                    pendingRequest.abort();
+                }
+                pendingRequest = new AbortController();
+                fetch(searchInput.dataset.suggestUrl + '?q=' + encodeURIComponent(query), { signal: pendingRequest.signal })
+                    .then(response => response.json())
+                    .then(data => showSuggestions(data.results))
+                    .catch(error => {
+                        if (error.name !== 'AbortError') {
+                            hideSuggestions();
+                        }
+                    });
+            }, 200);
+        });
+
+        searchInput.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape') {
+                hideSuggestions();
+            }
+        });
+
+        document.addEventListener('click', function(e) {
+            if (e.target !== searchInput && !suggestionList.contains(e.target)) {
+                hideSuggestions();
+            }
         });
     }
 
@@ -7,10 +7,24 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import logging
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stocktracker_sa.settings')
 
 application = get_asgi_application()
+
+# Warm the process up at import time, so servers that preload the
+# application (gunicorn --preload) do it once before forking workers.
+# Warm-up is only an optimisation: a failure (database unreachable or not yet
+# migrated mid-deploy) is logged and the application still starts.
+if getattr(settings, 'WARMUP_ON_STARTUP', False):
+    try:
+        from inventory.warmup import warm_up
+
+        warm_up()
+    except Exception:
+        logging.getLogger(__name__).exception('Warm-up failed; serving cold')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -122,3 +123,40 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Archival of historical sales and stock movements (see archive_history command)
+
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
+
+# Columnar analytics snapshot of sales (see build_analytics_snapshot command)
+
+ANALYTICS_SNAPSHOT_DIR = BASE_DIR / 'analytics'
+
+
+# Sharded stock counters for hot products (see fold_stock_counters command)
+
+STOCK_COUNTER_SHARDS = 8
+
+
+# Batched, idempotent sale submission from POS tills
+
+SALE_INGEST_MAX_BATCH = 5000
+# Tills authenticate with "Authorization: Bearer <token>"; comma-separated
+SALE_INGEST_TOKENS = [token for token in os.environ.get('SALE_INGEST_TOKENS', '').split(',') if token]
+
+
+# Typeahead product search (see inventory.search)
+
+TYPEAHEAD_RESULTS = 8
+TYPEAHEAD_CACHE_SIZE = 1024
+TYPEAHEAD_CACHE_TTL = 30  # seconds
+
+
+# ABC inventory classification (see inventory.classification)
+
+ABC_CLASS_A_SHARE = 0.80  # Cumulative revenue share covered by class A
+ABC_CLASS_B_SHARE = 0.95  # ... by classes A and B
+ABC_CACHE_TIMEOUT = 300  # seconds
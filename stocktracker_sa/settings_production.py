@@ -0,0 +1,58 @@
+"""
+Production serving profile for stocktracker_sa.
+
+Use with DJANGO_SETTINGS_MODULE=stocktracker_sa.settings_production. Compiled
+templates are cached for the life of the worker, and the WSGI/ASGI entry
+points warm the process up at import time so a preloading server (e.g.
+``gunicorn --preload``) pays the start-up cost once, before forking workers.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+
+def required_env(name):
+    value = os.environ.get(name, '').strip()
+    if not value:
+        raise ImproperlyConfigured(f'Set the {name} environment variable for production')
+    return value
+
+
+DEBUG = False
+
+SECRET_KEY = required_env('DJANGO_SECRET_KEY')
+
+# Comma-separated, e.g. "stock.example.co.za,www.stock.example.co.za"
+ALLOWED_HOSTS = [host.strip() for host in required_env('DJANGO_ALLOWED_HOSTS').split(',') if host.strip()]
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Keep database connections open between requests instead of reconnecting
+CONN_MAX_AGE = 60
+CONN_HEALTH_CHECKS = True
+
+# Run inventory.warmup.warm_up() when the WSGI/ASGI application is imported
+WARMUP_ON_STARTUP = True